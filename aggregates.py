@@ -0,0 +1,182 @@
+# Running score aggregates
+# Every saved quiz result updates a handful of counters in a local SQLite
+# database, so cohort views (attempts, mean score, per-question difficulty,
+# per-topic accuracy, leaderboards) never have to re-read the result CSVs.
+# Each update touches only the rows for one topic, one candidate and the
+# questions in that quiz, so its cost does not grow with submission volume.
+import os
+import math
+import time
+import hashlib
+import sqlite3
+from dedup import normalize_text
+
+DEFAULT_DB = os.getenv('MCQ_AGGREGATES_DB', os.path.join('results', 'aggregates.db'))
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS topic_stats (
+    topic_key TEXT PRIMARY KEY,
+    topic TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    score_sum REAL NOT NULL DEFAULT 0,
+    score_sq_sum REAL NOT NULL DEFAULT 0,
+    best_score REAL NOT NULL DEFAULT 0,
+    questions_answered INTEGER NOT NULL DEFAULT 0,
+    questions_correct INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL
+);
+CREATE TABLE IF NOT EXISTS question_stats (
+    question_key TEXT PRIMARY KEY,
+    topic_key TEXT NOT NULL,
+    question TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    correct INTEGER NOT NULL DEFAULT 0,
+    difficulty_index REAL NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS question_stats_difficulty ON question_stats (topic_key, difficulty_index);
+CREATE TABLE IF NOT EXISTS leaderboard (
+    topic_key TEXT NOT NULL,
+    candidate TEXT NOT NULL,
+    best_score REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    updated_at REAL,
+    PRIMARY KEY (topic_key, candidate)
+);
+CREATE INDEX IF NOT EXISTS leaderboard_best ON leaderboard (topic_key, best_score DESC);
+"""
+
+
+def topic_key(topic):
+    return normalize_text(topic or "unknown")
+
+
+def question_key(question):
+    return hashlib.sha1(normalize_text(question).encode('utf-8')).hexdigest()
+
+
+class ScoreAggregates:
+    def __init__(self, path=DEFAULT_DB):
+        """Open (and create if needed) the aggregates database"""
+        self.path = path
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        return conn
+
+    def record(self, results, topic, candidate=None):
+        """
+        Fold one evaluated quiz (QuizManager.results) into the aggregates
+        - topic: quiz topic as typed by the user
+        - candidate: optional name for the leaderboard
+        Returns the quiz score as a percentage
+        """
+        if not results:
+            return None
+        correct = sum(1 for r in results if r['is_correct'])
+        score = correct / len(results) * 100
+        key = topic_key(topic)
+        now = time.time()
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute(
+                    "INSERT INTO topic_stats (topic_key, topic, attempts, score_sum, score_sq_sum, best_score, "
+                    "questions_answered, questions_correct, updated_at) VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?) "
+                    "ON CONFLICT(topic_key) DO UPDATE SET attempts = attempts + 1, "
+                    "score_sum = score_sum + excluded.score_sum, "
+                    "score_sq_sum = score_sq_sum + excluded.score_sq_sum, "
+                    "best_score = MAX(best_score, excluded.best_score), "
+                    "questions_answered = questions_answered + excluded.questions_answered, "
+                    "questions_correct = questions_correct + excluded.questions_correct, "
+                    "updated_at = excluded.updated_at",
+                    (key, topic, score, score * score, score, len(results), correct, now)
+                )
+                conn.executemany(
+                    "INSERT INTO question_stats (question_key, topic_key, question, attempts, correct, difficulty_index) "
+                    "VALUES (?, ?, ?, 1, ?, ?) "
+                    "ON CONFLICT(question_key) DO UPDATE SET attempts = attempts + 1, "
+                    "correct = correct + excluded.correct, "
+                    "difficulty_index = CAST(correct + excluded.correct AS REAL) / (attempts + 1)",
+                    [(question_key(r['question']), key, r['question'], int(bool(r['is_correct'])),
+                      float(bool(r['is_correct']))) for r in results]
+                )
+                if candidate:
+                    conn.execute(
+                        "INSERT INTO leaderboard (topic_key, candidate, best_score, attempts, updated_at) "
+                        "VALUES (?, ?, ?, 1, ?) "
+                        "ON CONFLICT(topic_key, candidate) DO UPDATE SET attempts = attempts + 1, "
+                        "best_score = MAX(best_score, excluded.best_score), updated_at = excluded.updated_at",
+                        (key, candidate.strip(), score, now)
+                    )
+        finally:
+            conn.close()
+        return score
+
+    def topic_summary(self):
+        """Attempts, mean / std-dev / best score and accuracy per topic"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT * FROM topic_stats ORDER BY attempts DESC").fetchall()
+        finally:
+            conn.close()
+        summary = []
+        for row in rows:
+            mean = row['score_sum'] / row['attempts'] if row['attempts'] else 0.0
+            variance = row['score_sq_sum'] / row['attempts'] - mean * mean if row['attempts'] else 0.0
+            summary.append({
+                'topic': row['topic'],
+                'attempts': row['attempts'],
+                'mean_score': round(mean, 1),
+                'score_std': round(math.sqrt(max(variance, 0.0)), 1),
+                'best_score': round(row['best_score'], 1),
+                'accuracy': round(row['questions_correct'] / row['questions_answered'] * 100, 1)
+                if row['questions_answered'] else 0.0,
+            })
+        return summary
+
+    def hardest_questions(self, topic, limit=10, min_attempts=1):
+        """Questions with the lowest difficulty index (share answered correctly)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT question, attempts, correct, difficulty_index FROM question_stats "
+                "WHERE topic_key = ? AND attempts >= ? ORDER BY difficulty_index LIMIT ?",
+                (topic_key(topic), min_attempts, limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+    def leaderboard(self, topic, limit=10):
+        """Best score per candidate for a topic, highest first"""
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT candidate, best_score, attempts FROM leaderboard "
+                "WHERE topic_key = ? ORDER BY best_score DESC LIMIT ?",
+                (topic_key(topic), limit)
+            ).fetchall()
+        finally:
+            conn.close()
+        return [dict(row) for row in rows]
+
+
+_aggregates = None
+
+
+def get_aggregates():
+    """Process-wide ScoreAggregates on the default database"""
+    global _aggregates
+    if _aggregates is None:
+        _aggregates = ScoreAggregates()
+    return _aggregates
@@ -0,0 +1,180 @@
+# Near-duplicate detection for generated questions
+# MinHash signatures over word shingles of the normalised question stem, with
+# LSH banding so a check only compares against a handful of candidates. The
+# answer is compared separately and must match: templated questions such as
+# "capital of France" / "capital of Spain" share most of their words but are
+# different questions.
+# Band keys live in one open-addressing table of 64-bit slots rather than a
+# dict, which keeps memory to a few hundred bytes per stored question.
+import re
+import zlib
+import random
+from array import array
+
+_PUNCTUATION = re.compile(r'[^\w\s]')
+_WHITESPACE = re.compile(r'\s+')
+_MASK32 = 0xFFFFFFFF
+_MASK64 = 0xFFFFFFFFFFFFFFFF
+# Large prime for the (a * x + b) mod p permutation family
+_PRIME = (1 << 61) - 1
+
+
+def normalize_text(text):
+    """Lower-case, strip punctuation and collapse whitespace"""
+    text = _PUNCTUATION.sub(' ', str(text).lower())
+    return _WHITESPACE.sub(' ', text).strip()
+
+
+def question_text(question):
+    """Text used to compare questions: the question plus its correct answer"""
+    if isinstance(question, dict):
+        return f"{question['question']} || {question['correct_answer']}"
+    answer = getattr(question, 'correct_answer', None) or getattr(question, 'answer', '')
+    return f"{question.question} || {answer}"
+
+
+def split_answer(text):
+    """(stem, answer) of a question_text() string; answer is '' for plain text"""
+    stem, separator, answer = str(text).rpartition(' || ')
+    if not separator:
+        return str(text), ''
+    return stem, answer
+
+
+def shingles(text, size=2):
+    """Hashed word n-grams of the normalised text"""
+    words = normalize_text(text).split()
+    if len(words) <= size:
+        return {zlib.crc32(' '.join(words).encode('utf-8'))}
+    return {
+        zlib.crc32(' '.join(words[i:i + size]).encode('utf-8'))
+        for i in range(len(words) - size + 1)
+    }
+
+
+class NearDuplicateIndex:
+    def __init__(self, num_perm=32, bands=16, threshold=0.5, shingle_size=2, seed=1):
+        """
+        MinHash / LSH index of question texts ("stem || answer", see question_text)
+        - num_perm: signature length (must be divisible by bands)
+        - bands: LSH bands; with 16 bands of 2 rows a same-answer pair at
+          Jaccard 0.5 is a candidate ~99% of the time, at 0.3 ~78%
+        - threshold: estimated Jaccard similarity of the stems treated as a
+          duplicate when the answers also match
+        - shingle_size: words per shingle
+        """
+        if num_perm % bands:
+            raise ValueError("num_perm must be divisible by bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.threshold = threshold
+        self.shingle_size = shingle_size
+        rng = random.Random(seed)
+        self._perms = [(rng.randrange(1, _PRIME), rng.randrange(0, _PRIME)) for _ in range(num_perm)]
+        self._signatures = array('I')
+        # crc32 of each stored item's normalised answer (0 for no answer)
+        self._answers = array('I')
+        self.count = 0
+        # Open-addressing table: slot = (tag << 32) | (id + 1), 0 means empty
+        self._table = array('Q', bytes(8 * 1024))
+        self._used = 0
+
+    def __len__(self):
+        return self.count
+
+    def signature(self, text):
+        """MinHash signature of the text's stem"""
+        hashes = shingles(split_answer(text)[0], self.shingle_size)
+        return [min((a * h + b) % _PRIME for h in hashes) & _MASK32 for a, b in self._perms]
+
+    def answer_hash(self, text):
+        answer = normalize_text(split_answer(text)[1])
+        return zlib.crc32(answer.encode('utf-8')) if answer else 0
+
+    def _band_keys(self, sig, answer):
+        # The answer is part of every band key, so only same-answer items
+        # ever become candidates
+        rows = self.rows
+        return [hash((band, answer) + tuple(sig[band * rows:(band + 1) * rows])) & _MASK64
+                for band in range(self.bands)]
+
+    def _insert_key(self, key, item_id):
+        table = self._table
+        mask = len(table) - 1
+        slot = key & mask
+        while table[slot]:
+            slot = (slot + 1) & mask
+        table[slot] = ((key >> 32) << 32) | (item_id + 1)
+
+    def _lookup_key(self, key):
+        table = self._table
+        mask = len(table) - 1
+        tag = key >> 32
+        slot = key & mask
+        found = []
+        while True:
+            value = table[slot]
+            if not value:
+                return found
+            if value >> 32 == tag:
+                found.append((value & _MASK32) - 1)
+            slot = (slot + 1) & mask
+
+    def _grow(self):
+        # Double the table and re-insert every band key (amortised O(1))
+        self._table = array('Q', bytes(16 * len(self._table)))
+        for item_id in range(self.count):
+            sig = self._signatures[item_id * self.num_perm:(item_id + 1) * self.num_perm]
+            for key in self._band_keys(sig, self._answers[item_id]):
+                self._insert_key(key, item_id)
+
+    def _similarity(self, sig, item_id):
+        stored = self._signatures[item_id * self.num_perm:(item_id + 1) * self.num_perm]
+        return sum(1 for x, y in zip(sig, stored) if x == y) / self.num_perm
+
+    def _query_sig(self, sig, answer):
+        best_id, best = None, 0.0
+        seen = set()
+        for key in self._band_keys(sig, answer):
+            for item_id in self._lookup_key(key):
+                if item_id in seen:
+                    continue
+                seen.add(item_id)
+                if self._answers[item_id] != answer:
+                    continue
+                similarity = self._similarity(sig, item_id)
+                if similarity > best:
+                    best_id, best = item_id, similarity
+        if best_id is not None and best >= self.threshold:
+            return best_id, best
+        return None
+
+    def query(self, text):
+        """Return (id, estimated similarity) of the closest stored duplicate, or None"""
+        return self._query_sig(self.signature(text), self.answer_hash(text))
+
+    def _add_sig(self, sig, answer):
+        item_id = self.count
+        if (self._used + self.bands) * 2 > len(self._table):
+            self._grow()
+        self._signatures.extend(sig)
+        self._answers.append(answer)
+        self.count += 1
+        for key in self._band_keys(sig, answer):
+            self._insert_key(key, item_id)
+        self._used += self.bands
+        return item_id
+
+    def add(self, text):
+        """Store a text and return its id"""
+        return self._add_sig(self.signature(text), self.answer_hash(text))
+
+    def check_and_add(self, text):
+        """True if text is a near-duplicate of a stored one; otherwise store it and return False"""
+        sig = self.signature(text)
+        answer = self.answer_hash(text)
+        if self._query_sig(sig, answer) is not None:
+            return True
+        self._add_sig(sig, answer)
+        return False
@@ -0,0 +1,129 @@
+# Shared exam rooms
+# An instructor generates a quiz once and opens a room for it; candidates join
+# with the room's short code. Every session reads the same frozen questions
+# held in this process - a candidate's session only keeps a small view (room,
+# candidate id) and its own answers, so memory and LLM cost do not grow with
+# the number of candidates. Option order is shuffled per candidate from the
+# room seed, so it is stable across reruns without being stored anywhere.
+import os
+import time
+import random
+import secrets
+import threading
+from types import MappingProxyType
+from collections.abc import Mapping, Sequence
+from variants import option_order
+
+# No 0/O or 1/I/L, so codes survive being read out or written on a board
+CODE_ALPHABET = "ABCDEFGHJKMNPQRSTUVWXYZ23456789"
+CODE_LENGTH = 6
+ROOM_TTL = float(os.getenv('MCQ_ROOM_TTL', str(24 * 3600)))
+
+
+def _freeze(question):
+    frozen = dict(question)
+    if 'options' in frozen:
+        frozen['options'] = tuple(frozen['options'])
+    return MappingProxyType(frozen)
+
+
+class ExamRoom:
+    __slots__ = ('code', 'questions', 'topic', 'difficulty', 'seed', 'created_at')
+
+    def __init__(self, code, questions, topic, difficulty, seed):
+        """Read-only quiz shared by every candidate in the room"""
+        object.__setattr__(self, 'code', code)
+        object.__setattr__(self, 'questions', tuple(_freeze(q) for q in questions))
+        object.__setattr__(self, 'topic', topic)
+        object.__setattr__(self, 'difficulty', difficulty)
+        object.__setattr__(self, 'seed', seed)
+        object.__setattr__(self, 'created_at', time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ExamRoom is read-only")
+
+    def option_order(self, index, candidate_id):
+        """Permutation of question index's options for one candidate"""
+        return option_order(self.questions[index], random.Random(f"{self.seed}:{candidate_id}:{index}"))
+
+    def candidate_quiz(self, candidate_id):
+        """The room's questions as seen by one candidate"""
+        return CandidateQuiz(self, candidate_id)
+
+
+class CandidateQuiz(Sequence):
+    # Sequence of per-candidate question views; nothing is copied up front
+    __slots__ = ('room', 'candidate_id')
+
+    def __init__(self, room, candidate_id):
+        self.room = room
+        self.candidate_id = candidate_id
+
+    def __len__(self):
+        return len(self.room.questions)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[i] for i in range(*index.indices(len(self)))]
+        return CandidateQuestion(self.room, index, self.candidate_id)
+
+
+class CandidateQuestion(Mapping):
+    # Read-only mapping: the shared question with the candidate's option order
+    __slots__ = ('_question', '_options')
+
+    def __init__(self, room, index, candidate_id):
+        self._question = room.questions[index]
+        self._options = None
+        if 'options' in self._question:
+            options = self._question['options']
+            self._options = [options[i] for i in room.option_order(index, candidate_id)]
+
+    def __getitem__(self, key):
+        if key == 'options' and self._options is not None:
+            return self._options
+        return self._question[key]
+
+    def __iter__(self):
+        return iter(self._question)
+
+    def __len__(self):
+        return len(self._question)
+
+
+_rooms = {}
+_rooms_lock = threading.Lock()
+
+
+def _new_code():
+    return ''.join(secrets.choice(CODE_ALPHABET) for _ in range(CODE_LENGTH))
+
+
+def create_room(questions, topic, difficulty):
+    """Freeze questions into a new room and return it; room.code is the join code"""
+    now = time.time()
+    with _rooms_lock:
+        # Drop expired rooms so the registry does not grow forever
+        for code in [c for c, r in _rooms.items() if now - r.created_at > ROOM_TTL]:
+            del _rooms[code]
+        code = _new_code()
+        while code in _rooms:
+            code = _new_code()
+        room = ExamRoom(code, questions, topic, difficulty, secrets.token_hex(8))
+        _rooms[code] = room
+    return room
+
+
+def get_room(code):
+    """Room for a join code (case and spaces ignored), or None"""
+    code = ''.join(str(code or '').split()).upper()
+    with _rooms_lock:
+        room = _rooms.get(code)
+    if room is not None and time.time() - room.created_at > ROOM_TTL:
+        return None
+    return room
+
+
+def close_room(code):
+    with _rooms_lock:
+        _rooms.pop(code, None)
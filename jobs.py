@@ -0,0 +1,338 @@
+# Out-of-process quiz generation
+# The Streamlit app submits generation jobs to a local SQLite queue and polls
+# for finished questions; a pool of worker processes runs QuestionGenerator.
+# Jobs outlive UI reruns and browser disconnects, and throughput scales with
+# the number of workers instead of the number of web server threads.
+#
+# Start workers with:  python jobs.py --workers 4
+import os
+import sys
+import json
+import time
+import uuid
+import socket
+import sqlite3
+import argparse
+import threading
+import multiprocessing
+
+DEFAULT_DB = os.getenv('MCQ_JOB_DB', 'jobs.db')
+# A running job's watcher refreshes its heartbeat every 0.5s; one that has
+# been silent this long belongs to a worker that died or hung
+STALE_AFTER = float(os.getenv('MCQ_JOB_STALE_AFTER', '60'))
+# How often each worker looks for stale jobs to take back
+REQUEUE_INTERVAL = 30
+
+# Job states
+PENDING = 'pending'
+RUNNING = 'running'
+CANCELLING = 'cancelling'
+DONE = 'done'
+CANCELLED = 'cancelled'
+FAILED = 'failed'
+FINISHED_STATES = (DONE, CANCELLED, FAILED)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id TEXT PRIMARY KEY,
+    status TEXT NOT NULL,
+    topic TEXT NOT NULL,
+    question_type TEXT NOT NULL,
+    difficulty TEXT NOT NULL,
+    num_questions INTEGER NOT NULL,
+    deadline REAL,
+    speculative INTEGER NOT NULL DEFAULT 0,
+    plan INTEGER NOT NULL DEFAULT 0,
+    session_id TEXT,
+    worker TEXT,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    heartbeat_at REAL,
+    finished_at REAL,
+    shortfall TEXT,
+    error TEXT
+);
+CREATE INDEX IF NOT EXISTS jobs_status_created ON jobs (status, created_at);
+CREATE TABLE IF NOT EXISTS job_questions (
+    job_id TEXT NOT NULL,
+    seq INTEGER NOT NULL,
+    payload TEXT NOT NULL,
+    PRIMARY KEY (job_id, seq)
+);
+"""
+
+
+class JobQueue:
+    def __init__(self, path=DEFAULT_DB):
+        """
+        SQLite-backed job queue shared by the app and the worker processes
+        A short-lived connection is opened per operation, so one JobQueue can
+        be used from any Streamlit thread
+        """
+        self.path = path
+        with self._connect() as conn:
+            conn.executescript(SCHEMA)
+            # Databases created before subtopic planning lack the plan column
+            columns = {row['name'] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if 'plan' not in columns:
+                conn.execute("ALTER TABLE jobs ADD COLUMN plan INTEGER NOT NULL DEFAULT 0")
+
+    def _connect(self):
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('PRAGMA synchronous=NORMAL')
+        return _Connection(conn)
+
+    def submit(self, topic, question_type, difficulty, num_questions, deadline=None,
+               speculative=False, plan=False, session_id=None):
+        """Queue a generation job and return its id"""
+        job_id = uuid.uuid4().hex[:12]
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, status, topic, question_type, difficulty, num_questions, "
+                "deadline, speculative, plan, session_id, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, PENDING, topic, question_type, difficulty, int(num_questions),
+                 deadline, int(bool(speculative)), int(bool(plan)), session_id, time.time())
+            )
+        return job_id
+
+    def get(self, job_id):
+        """Job row as a dict (with a 'completed' question count), or None"""
+        with self._connect() as conn:
+            row = conn.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return None
+            job = dict(row)
+            job['completed'] = conn.execute(
+                "SELECT COUNT(*) FROM job_questions WHERE job_id = ?", (job_id,)
+            ).fetchone()[0]
+        job['shortfall'] = json.loads(job['shortfall']) if job['shortfall'] else None
+        return job
+
+    def questions(self, job_id, after=-1):
+        """Completed questions for a job, in order, with seq greater than after"""
+        with self._connect() as conn:
+            rows = conn.execute(
+                "SELECT payload FROM job_questions WHERE job_id = ? AND seq > ? ORDER BY seq",
+                (job_id, after)
+            ).fetchall()
+        return [json.loads(row['payload']) for row in rows]
+
+    def cancel(self, job_id):
+        """Ask for a job to stop; pending jobs are cancelled straight away"""
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ? WHERE id = ? AND status = ?",
+                (CANCELLED, time.time(), job_id, PENDING)
+            )
+            conn.execute(
+                "UPDATE jobs SET status = ? WHERE id = ? AND status = ?",
+                (CANCELLING, job_id, RUNNING)
+            )
+
+    def claim(self, worker):
+        """Atomically take the oldest pending job, or return None"""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id FROM jobs WHERE status = ? ORDER BY created_at LIMIT 1", (PENDING,)
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                now = time.time()
+                conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, started_at = ?, heartbeat_at = ? WHERE id = ?",
+                    (RUNNING, worker, now, now, row['id'])
+                )
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return self.get(row['id'])
+
+    def add_question(self, job_id, seq, record):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO job_questions (job_id, seq, payload) VALUES (?, ?, ?)",
+                (job_id, seq, json.dumps(record))
+            )
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+
+    def heartbeat(self, job_id):
+        """Refresh the job's heartbeat and return True if a cancel was requested"""
+        with self._connect() as conn:
+            conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time(), job_id))
+            row = conn.execute("SELECT status FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return row is not None and row['status'] == CANCELLING
+
+    def finish(self, job_id, status, shortfall=None, error=None):
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, shortfall = ?, error = ? WHERE id = ?",
+                (status, time.time(), json.dumps(shortfall) if shortfall else None, error, job_id)
+            )
+
+    def requeue_stale(self, stale_after=STALE_AFTER):
+        """
+        Put running jobs whose worker stopped sending heartbeats back in the queue
+        Stale jobs that were being cancelled are marked cancelled instead.
+        Returns the number of jobs requeued
+        """
+        now = time.time()
+        cutoff = now - stale_after
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                conn.execute(
+                    "UPDATE jobs SET status = ?, finished_at = ? WHERE status = ? AND heartbeat_at < ?",
+                    (CANCELLED, now, CANCELLING, cutoff)
+                )
+                conn.execute(
+                    "DELETE FROM job_questions WHERE job_id IN "
+                    "(SELECT id FROM jobs WHERE status = ? AND heartbeat_at < ?)",
+                    (RUNNING, cutoff)
+                )
+                requeued = conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL WHERE status = ? AND heartbeat_at < ?",
+                    (PENDING, RUNNING, cutoff)
+                ).rowcount
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        return requeued
+
+    def fail_stale(self, job_id, stale_after=2 * STALE_AFTER):
+        """
+        Mark a job failed if its worker has sent no heartbeat for stale_after
+        seconds; returns True if it did. Workers requeue stale jobs sooner, so
+        this only fires when no worker is left to pick the job up
+        """
+        with self._connect() as conn:
+            return conn.execute(
+                "UPDATE jobs SET status = ?, finished_at = ?, error = ? "
+                "WHERE id = ? AND status IN (?, ?) AND heartbeat_at < ?",
+                (FAILED, time.time(), "The worker running this job stopped responding",
+                 job_id, RUNNING, CANCELLING, time.time() - stale_after)
+            ).rowcount > 0
+
+    def stats(self):
+        """Number of jobs in each state"""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {row['status']: row['n'] for row in rows}
+
+
+class _Connection:
+    # Context manager that always closes the underlying sqlite3 connection
+    def __init__(self, conn):
+        self.conn = conn
+
+    def __enter__(self):
+        return self.conn
+
+    def __exit__(self, *exc):
+        self.conn.close()
+
+
+def run_job(queue, job, generator):
+    """Generate one job's questions, storing each as soon as it is validated"""
+    from utils import generate_question_set, question_to_dict
+
+    cancel_event = threading.Event()
+    stop_watching = threading.Event()
+
+    # Poll the queue for cancel requests while the LLM calls are in flight
+    def watch():
+        while not stop_watching.wait(0.5):
+            if queue.heartbeat(job['id']):
+                cancel_event.set()
+                return
+
+    def store(question):
+        queue.add_question(job['id'], len(stored), question_to_dict(question, job['question_type']))
+        stored.append(question)
+
+    stored = []
+    watcher = threading.Thread(target=watch, daemon=True)
+    watcher.start()
+    try:
+        _, shortfall, _ = generate_question_set(
+            generator, job['topic'], job['question_type'], job['difficulty'], job['num_questions'],
+            deadline=job['deadline'], cancel_event=cancel_event,
+            speculative=bool(job['speculative']), plan=bool(job['plan']), on_question=store
+        )
+    finally:
+        stop_watching.set()
+        watcher.join()
+
+    errors = shortfall['errors']
+    if shortfall['reason'] == 'cancelled':
+        status = CANCELLED
+    elif not stored:
+        status = FAILED
+    else:
+        status = DONE
+    queue.finish(job['id'], status, shortfall, errors[-1] if errors and not stored else None)
+    return status
+
+
+def worker_loop(db_path=DEFAULT_DB, poll_interval=0.5, max_jobs=None):
+    """Claim and run jobs until interrupted (or max_jobs have been run)"""
+    from utils import QuestionGenerator
+
+    queue = JobQueue(db_path)
+    worker = f"{socket.gethostname()}:{os.getpid()}"
+    done = 0
+    next_requeue = 0
+    while max_jobs is None or done < max_jobs:
+        # Take back jobs from workers that died while this one keeps running
+        if time.monotonic() >= next_requeue:
+            queue.requeue_stale()
+            next_requeue = time.monotonic() + REQUEUE_INTERVAL
+        job = queue.claim(worker)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        generator = QuestionGenerator(session_id=job['session_id'] or job['id'])
+        try:
+            run_job(queue, job, generator)
+        except Exception as e:
+            queue.finish(job['id'], FAILED, error=str(e))
+        done += 1
+
+
+def run_workers(num_workers, db_path=DEFAULT_DB):
+    """Start num_workers worker processes and wait for them"""
+    # Each process has its own LLM scheduler, so split the provider quota
+    rate = float(os.getenv('LLM_REQUESTS_PER_MINUTE', '30'))
+    os.environ['LLM_REQUESTS_PER_MINUTE'] = str(rate / num_workers)
+    processes = [
+        multiprocessing.Process(target=worker_loop, args=(db_path,), daemon=True)
+        for _ in range(num_workers)
+    ]
+    for process in processes:
+        process.start()
+    try:
+        for process in processes:
+            process.join()
+    except KeyboardInterrupt:
+        for process in processes:
+            process.terminate()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run quiz generation worker processes")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 2)
+    parser.add_argument('--db', default=DEFAULT_DB)
+    args = parser.parse_args(argv)
+    print(f"Starting {args.workers} workers on {args.db}")
+    run_workers(args.workers, args.db)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
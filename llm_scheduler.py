@@ -0,0 +1,209 @@
+# Process-wide admission control for LLM calls
+# Every QuestionGenerator in the Streamlit process sends its requests through
+# one shared scheduler so a single large quiz cannot use up the provider quota
+import os
+import time
+import threading
+from collections import OrderedDict, deque
+from enum import IntEnum
+
+
+# Priority classes - lower value is served first
+class Priority(IntEnum):
+    INTERACTIVE = 0   # quiz generation a user is waiting on
+    BACKGROUND = 1    # queued jobs, planning, prefetching
+    BULK = 2          # bank building, benchmarks, offline batches
+
+
+class SchedulerTimeout(RuntimeError):
+    """Raised when a call could not be admitted before its deadline"""
+
+
+class _Ticket:
+    # One waiting call; granted is set by the dispatcher under the lock
+    __slots__ = ("session_id", "priority", "enqueued_at", "granted")
+
+    def __init__(self, session_id, priority):
+        self.session_id = session_id
+        self.priority = priority
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+
+
+class TokenBucket:
+    def __init__(self, rate_per_second, burst):
+        """
+        Simple token bucket matched to the provider's requests-per-minute quota
+        - rate_per_second: refill rate (0 or None disables rate limiting)
+        - burst: maximum tokens that can accumulate while idle
+        """
+        self.rate = rate_per_second
+        self.capacity = max(1.0, float(burst))
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        if self.rate:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def try_take(self, now):
+        """Take one token if available, otherwise return seconds until the next one"""
+        if not self.rate:
+            return 0.0
+        self._refill(now)
+        if self.tokens >= 1.0:
+            self.tokens -= 1.0
+            return 0.0
+        return (1.0 - self.tokens) / self.rate
+
+
+class LLMScheduler:
+    def __init__(self, max_concurrency=4, requests_per_minute=30, burst=None, wait_window=200):
+        """
+        Admission control for LLM requests
+        - max_concurrency: global limit on in-flight calls
+        - requests_per_minute: token bucket refill rate (0 disables it)
+        - burst: bucket size, defaults to max_concurrency
+        - wait_window: how many recent wait times are kept for stats
+
+        Waiting calls are grouped by priority class, then queued per session
+        and served round-robin so one session cannot starve the others.
+        """
+        self.max_concurrency = max(1, int(max_concurrency))
+        rate = requests_per_minute / 60.0 if requests_per_minute else 0
+        self.bucket = TokenBucket(rate, burst if burst is not None else self.max_concurrency)
+        self.in_flight = 0
+        self.granted_total = 0
+        self.recent_waits = deque(maxlen=wait_window)
+        # priority -> OrderedDict(session_id -> deque of tickets)
+        self._queues = {p: OrderedDict() for p in Priority}
+        self._cond = threading.Condition()
+        # Earliest moment the bucket will have a token; waiters sleep until then
+        self._next_token_at = 0.0
+
+    def _next_ticket(self):
+        # Highest priority class first, round-robin across sessions inside it
+        for priority in Priority:
+            sessions = self._queues[priority]
+            if not sessions:
+                continue
+            session_id, tickets = next(iter(sessions.items()))
+            ticket = tickets.popleft()
+            del sessions[session_id]
+            if tickets:
+                # Move the session to the back of the rotation
+                sessions[session_id] = tickets
+            return ticket
+        return None
+
+    def _has_waiting(self):
+        return any(self._queues[p] for p in Priority)
+
+    def _dispatch(self):
+        # Must be called with the condition held
+        granted_any = False
+        while self.in_flight < self.max_concurrency and self._has_waiting():
+            now = time.monotonic()
+            delay = self.bucket.try_take(now)
+            if delay > 0:
+                self._next_token_at = now + delay
+                break
+            ticket = self._next_ticket()
+            ticket.granted = True
+            self.in_flight += 1
+            self.granted_total += 1
+            self.recent_waits.append(now - ticket.enqueued_at)
+            granted_any = True
+        if granted_any:
+            self._cond.notify_all()
+
+    def _remove(self, ticket):
+        tickets = self._queues[ticket.priority].get(ticket.session_id)
+        if tickets is None:
+            return
+        try:
+            tickets.remove(ticket)
+        except ValueError:
+            return
+        if not tickets:
+            del self._queues[ticket.priority][ticket.session_id]
+
+    def acquire(self, session_id="default", priority=Priority.INTERACTIVE, deadline=None, cancel_event=None):
+        """
+        Block until this call may start
+        deadline is an absolute time.monotonic() value; cancel_event is a
+        threading.Event. Either one firing removes the call from the queue.
+        """
+        ticket = _Ticket(session_id, Priority(priority))
+        with self._cond:
+            self._queues[ticket.priority].setdefault(session_id, deque()).append(ticket)
+            self._dispatch()
+            while not ticket.granted:
+                now = time.monotonic()
+                if cancel_event is not None and cancel_event.is_set():
+                    self._remove(ticket)
+                    raise SchedulerTimeout("LLM call cancelled while queued")
+                if deadline is not None and now >= deadline:
+                    self._remove(ticket)
+                    raise SchedulerTimeout("Deadline passed while waiting for an LLM slot")
+                # Wake up for the next token, the deadline or a cancel poll
+                timeout = 0.25
+                if self._next_token_at > now:
+                    timeout = min(timeout, self._next_token_at - now)
+                if deadline is not None:
+                    timeout = min(timeout, deadline - now)
+                self._cond.wait(max(timeout, 0.001))
+                if not ticket.granted:
+                    self._dispatch()
+
+    def release(self):
+        """Mark one in-flight call as finished and admit the next waiter"""
+        with self._cond:
+            self.in_flight = max(0, self.in_flight - 1)
+            self._dispatch()
+
+    def run(self, fn, session_id="default", priority=Priority.INTERACTIVE, deadline=None, cancel_event=None):
+        """Run fn() once admitted, releasing the slot afterwards"""
+        self.acquire(session_id, priority, deadline, cancel_event)
+        try:
+            return fn()
+        finally:
+            self.release()
+
+    def stats(self):
+        """Snapshot of queue depth and recent wait times (seconds)"""
+        with self._cond:
+            by_priority = {
+                p.name.lower(): sum(len(t) for t in self._queues[p].values())
+                for p in Priority
+            }
+            waits = list(self.recent_waits)
+            return {
+                'queue_depth': sum(by_priority.values()),
+                'queue_depth_by_priority': by_priority,
+                'waiting_sessions': sum(len(self._queues[p]) for p in Priority),
+                'in_flight': self.in_flight,
+                'max_concurrency': self.max_concurrency,
+                'granted_total': self.granted_total,
+                'mean_wait': sum(waits) / len(waits) if waits else 0.0,
+                'max_wait': max(waits) if waits else 0.0,
+            }
+
+
+# Shared scheduler for the whole process, configured from environment variables
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+
+def get_scheduler():
+    """Return the process-wide scheduler, creating it on first use"""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = LLMScheduler(
+                max_concurrency=int(os.getenv('LLM_MAX_CONCURRENCY', '4')),
+                requests_per_minute=float(os.getenv('LLM_REQUESTS_PER_MINUTE', '30')),
+                burst=float(os.getenv('LLM_BURST')) if os.getenv('LLM_BURST') else None,
+            )
+        return _scheduler
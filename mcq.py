@@ -3,7 +3,18 @@ import pandas as pd
 import random
 import os
 import base64
-from utils import QuestionGenerator
+import shutil
+import uuid
+import time
+from utils import QuestionGenerator, generate_question_set, question_to_dict
+from llm_scheduler import get_scheduler
+from question_bank import get_bank, BankQuestionSource
+from profiling import profiling_requested, start_rerun_profile
+from jobs import JobQueue, FINISHED_STATES
+from paper_render import render_papers
+from aggregates import get_aggregates
+from exam_rooms import create_room, get_room
+from variants import variant_report
 
 # Function to load and encode images for background
 def get_base64_of_bin_file(bin_file):
@@ -22,8 +33,23 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Opt-in profiling of this script run (MCQ_PROFILE=1 or ?profile=1)
+# Kept in session state so a run interrupted before profiler.finish() is
+# closed at the start of the next one
+profiler = start_rerun_profile(
+    profiling_requested(st.query_params),
+    label=st.session_state.get('session_id', 'new')[:8],
+    state=st.session_state
+)
+
+def rerun():
+    """Finish this run's profile before handing control back to Streamlit"""
+    profiler.finish()
+    st.rerun()
+
 #UI
-st.markdown("""
+with profiler.phase("css"):
+    st.markdown("""
     <style>
         /* Base styling */
         * {
@@ -297,36 +323,73 @@ class QuizManager:
         self.questions = []
         self.user_answers = []
         self.results = []
+        # The score aggregates take each evaluated result once, however
+        # often it is saved
+        self.results_recorded = False
+        self.save_warning = None
+        self.shortfall = None
+        self.speculation = None
+        self.topic = None
+        self.room_code = None
+        # Exam room this quiz was shared through, if its instructor opened one
+        self.hosted_room_code = None
+
+    def _add_question(self, question, question_type):
+        self.questions.append(question_to_dict(question, question_type))
+
+    def load_questions(self, questions, shortfall=None, topic=None):
+        """Use questions produced elsewhere (e.g. by a background job) as the quiz"""
+        self.questions = list(questions)
+        self.topic = topic
+        self.room_code = None
+        self.hosted_room_code = None
+        self.user_answers = ["" for _ in self.questions]
+        self.results = []
+        self.shortfall = shortfall
+        self.speculation = None
+        return bool(self.questions)
 
-    def generate_questions(self, generator, topic, question_type, difficulty, num_questions):
+    def join_room(self, room, candidate_id):
+        """Sit a shared exam room's quiz; only this candidate's answers are stored here"""
+        self.questions = room.candidate_quiz(candidate_id)
+        self.user_answers = ["" for _ in self.questions]
+        self.results = []
+        self.shortfall = None
+        self.speculation = None
+        self.topic = room.topic
+        self.room_code = room.code
+        self.hosted_room_code = None
+        return bool(self.questions)
+
+    def generate_questions(self, generator, topic, question_type, difficulty, num_questions,
+                           deadline=None, cancel_event=None, speculative=False, dedup_index=None,
+                           plan=False):
         self.questions = []
         self.user_answers = []
         self.results = []
-        
-        try:
-            for _ in range(num_questions):
-                if question_type == "Multiple Choice":
-                    question = generator.generate_mcq(topic, difficulty.lower())
-                    self.questions.append({
-                        'type': 'MCQ',
-                        'question': question.question,
-                        'options': question.options,
-                        'correct_answer': question.correct_answer
-                    })
-                else:
-                    question = generator.generate_fill_blank(topic, difficulty.lower())
-                    self.questions.append({
-                        'type': 'Fill in the Blank',
-                        'question': question.question,
-                        'correct_answer': question.answer
-                    })
-            
-            # Initialize user_answers list with placeholders
-            self.user_answers = ["" for _ in self.questions]
-            return True
-        except Exception as e:
-            st.error(f"Error generating questions: {e}")
+        self.topic = topic
+        self.room_code = None
+        self.hosted_room_code = None
+        # Partial quizzes are kept; shortfall says what is missing and why
+        generated, self.shortfall, self.speculation = generate_question_set(
+            generator, topic, question_type, difficulty, num_questions,
+            deadline=deadline, cancel_event=cancel_event, speculative=speculative,
+            dedup_index=dedup_index, plan=plan
+        )
+        for question in generated:
+            self._add_question(question, question_type)
+        # How far each LLM call stretches once variants are derived from it
+        variants = variant_report(self.questions, self.shortfall['llm_calls'])
+        self.shortfall['stems_per_call'] = variants['stems_per_call']
+        self.shortfall['option_orders_per_call'] = variants['option_orders_per_call']
+        
+        # Initialize user_answers list with placeholders
+        self.user_answers = ["" for _ in self.questions]
+        if not self.questions:
+            errors = self.shortfall['errors']
+            st.error(f"Error generating questions: {errors[-1] if errors else self.shortfall['reason']}")
             return False
+        return True
 
     def attempt_quiz(self):
         for i, q in enumerate(self.questions):
@@ -372,6 +435,8 @@ class QuizManager:
 
     def evaluate_quiz(self):
         self.results = []
+        self.results_recorded = False
+        self.save_warning = None
         for i, (q, user_ans) in enumerate(zip(self.questions, self.user_answers)):
             if q['type'] == 'MCQ':
                 # For MCQ with radio buttons, we compare the selected option with the correct answer
@@ -403,7 +468,7 @@ class QuizManager:
     def generate_result_dataframe(self):
         return pd.DataFrame(self.results)
 
-    def save_to_csv(self):
+    def save_to_csv(self, candidate=None):
         try:
             if not self.results:
                 st.warning("No results to save.")
@@ -417,13 +482,22 @@ class QuizManager:
             os.makedirs('results', exist_ok=True)
             full_path = os.path.join('results', unique_filename)
             df.to_csv(full_path, index=False)
-            
-            st.success(f"Results saved successfully!")
-            return full_path
         except Exception as e:
             st.error(f"Failed to save results: {e}")
             return None
 
+        # Running totals for the dashboard, updated once per evaluated result;
+        # a failure here does not undo the saved CSV and is retried on the next save
+        self.save_warning = None
+        if not self.results_recorded:
+            try:
+                get_aggregates().record(self.results, self.topic, candidate)
+                self.results_recorded = True
+            except Exception as e:
+                self.save_warning = f"Results saved, but the score dashboard could not be updated: {e}"
+        st.success(f"Results saved successfully!")
+        return full_path
+
 # Initialize session state
 if 'quiz_manager' not in st.session_state:
     st.session_state.quiz_manager = QuizManager()
@@ -431,12 +505,28 @@ if 'quiz_generated' not in st.session_state:
     st.session_state.quiz_generated = False
 if 'quiz_submitted' not in st.session_state:
     st.session_state.quiz_submitted = False
+# Per-session id used by the LLM scheduler for fair queuing
+if 'session_id' not in st.session_state:
+    st.session_state.session_id = uuid.uuid4().hex
+
+# Background job mode: generation runs in worker processes (python jobs.py)
+job_queue = JobQueue(os.environ['MCQ_JOB_DB']) if os.getenv('MCQ_JOB_DB') else None
+if 'job_id' not in st.session_state:
+    # Pick an unfinished job back up after a browser reconnect
+    st.session_state.job_id = st.query_params.get('job') if job_queue else None
 
 # Sidebar
-with st.sidebar:
+with st.sidebar, profiler.phase("sidebar"):
     st.markdown('<h2 style="color: white; text-align: center;">NIELIT Quiz</h2>', unsafe_allow_html=True)
     st.markdown('<p style="color: #a0aec0; text-align: center; margin-bottom: 20px;">Configure your quiz settings</p>', unsafe_allow_html=True)
     
+    # Question source - the offline bank is only offered when one is installed
+    question_bank = get_bank()
+    question_source = "AI Generator"
+    if question_bank is not None:
+        st.markdown('<p style="color: #a0aec0; font-weight: 600;">Question Source</p>', unsafe_allow_html=True)
+        question_source = st.selectbox("", ["AI Generator", "Offline Bank"], index=0, label_visibility="collapsed")
+    
     # Quiz configuration
     st.markdown('<p style="color: #a0aec0; font-weight: 600;">Question Format</p>', unsafe_allow_html=True)
     question_type = st.selectbox("", ["Multiple Choice", "Fill in the Blank"], index=0, label_visibility="collapsed")
@@ -450,10 +540,31 @@ with st.sidebar:
     st.markdown('<p style="color: #a0aec0; font-weight: 600; margin-top: 15px;">Number of Questions</p>', unsafe_allow_html=True)
     num_questions = st.number_input("", min_value=1, max_value=50, value=5, label_visibility="collapsed")
     
+    st.markdown('<p style="color: #a0aec0; font-weight: 600; margin-top: 15px;">Time Limit (seconds, 0 = none)</p>', unsafe_allow_html=True)
+    time_limit = st.number_input("", min_value=0, max_value=600, value=0, step=10, label_visibility="collapsed")
+    
+    # Spare parallel generations trade extra LLM calls for lower tail latency
+    speculative_mode = False
+    plan_mode = False
+    if question_source == "AI Generator":
+        speculative_mode = st.checkbox("Fast mode (speculative generation)", value=False)
+        plan_mode = st.checkbox("Spread questions across subtopics", value=False)
+    
     # Generate quiz button
     st.markdown('<div style="margin-top: 25px;"></div>', unsafe_allow_html=True)
     generate_quiz = st.button("Generate Quiz", use_container_width=True)
     
+    show_dashboard = st.checkbox("Show score dashboard", value=False)
+    
+    # Candidates sit an instructor's quiz by entering its room code
+    st.markdown('<p style="color: #a0aec0; font-weight: 600; margin-top: 15px;">Exam Room Code</p>', unsafe_allow_html=True)
+    room_code = st.text_input("", placeholder="e.g. K7MP2Q", label_visibility="collapsed")
+    join_exam_room = st.button("Join Exam Room", use_container_width=True)
+    
+    # Shared LLM queue status
+    scheduler_stats = get_scheduler().stats()
+    st.markdown(f'<p style="color: #a0aec0; font-size: 0.8rem; text-align: center; margin-top: 10px;">LLM queue: {scheduler_stats["queue_depth"]} waiting · {scheduler_stats["in_flight"]} running · avg wait {scheduler_stats["mean_wait"]:.1f}s</p>', unsafe_allow_html=True)
+    
     # Sidebar footer
     st.markdown('<div class="footer" style="color: #a0aec0; margin-top: 40px;">NIELIT MCQ Generator<br>© 2025</div>', unsafe_allow_html=True)
 
@@ -476,18 +587,104 @@ with content_col:
     ''', unsafe_allow_html=True)
     st.markdown('</div>', unsafe_allow_html=True)
     
+    # Cohort dashboard - reads only the running aggregates, never the result files
+    if show_dashboard:
+        with profiler.phase("dashboard"):
+            aggregates = get_aggregates()
+            summary = aggregates.topic_summary()
+            st.markdown('<div class="content-card">', unsafe_allow_html=True)
+            st.markdown('<h2>Score Dashboard</h2>', unsafe_allow_html=True)
+            if summary:
+                st.dataframe(pd.DataFrame(summary), use_container_width=True, hide_index=True)
+                dashboard_topic = st.selectbox("Topic", [row['topic'] for row in summary])
+                col1, col2 = st.columns(2)
+                with col1:
+                    st.markdown('<p style="font-weight: 600;">Hardest Questions</p>', unsafe_allow_html=True)
+                    st.dataframe(pd.DataFrame(aggregates.hardest_questions(dashboard_topic)),
+                                 use_container_width=True, hide_index=True)
+                with col2:
+                    st.markdown('<p style="font-weight: 600;">Leaderboard</p>', unsafe_allow_html=True)
+                    st.dataframe(pd.DataFrame(aggregates.leaderboard(dashboard_topic)),
+                                 use_container_width=True, hide_index=True)
+            else:
+                st.info("No saved results yet.")
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Join a shared exam room
+    if join_exam_room:
+        room = get_room(room_code)
+        if room is None:
+            st.error("No exam room with that code.")
+        else:
+            st.session_state.quiz_submitted = False
+            st.session_state.quiz_generated = st.session_state.quiz_manager.join_room(
+                room, st.session_state.session_id
+            )
+            rerun()
+    
     # Process quiz generation
-    if generate_quiz:
-        with st.spinner("Creating your personalized quiz..."):
+    if generate_quiz and job_queue is not None and question_source == "AI Generator":
+        # Hand the work to the worker pool and poll for it below
+        st.session_state.quiz_submitted = False
+        st.session_state.quiz_generated = False
+        st.session_state.job_id = job_queue.submit(
+            topic, question_type, difficulty, num_questions,
+            deadline=time_limit or None, speculative=speculative_mode, plan=plan_mode,
+            session_id=st.session_state.session_id
+        )
+        st.query_params['job'] = st.session_state.job_id
+        rerun()
+    elif generate_quiz:
+        with st.spinner("Creating your personalized quiz..."), profiler.phase("generate"):
             st.session_state.quiz_submitted = False
-            generator = QuestionGenerator()
+            if question_source == "Offline Bank":
+                generator = BankQuestionSource(question_bank)
+            else:
+                generator = QuestionGenerator(session_id=st.session_state.session_id)
             st.session_state.quiz_generated = st.session_state.quiz_manager.generate_questions(
-                generator, topic, question_type, difficulty, num_questions
+                generator, topic, question_type, difficulty, num_questions,
+                deadline=time_limit or None,
+                speculative=speculative_mode,
+                plan=plan_mode
+            )
+            rerun()
+
+    # Poll a running background job
+    if job_queue is not None and st.session_state.job_id:
+        job = job_queue.get(st.session_state.job_id)
+        if job is None:
+            st.session_state.job_id = None
+            st.query_params.pop('job', None)
+        elif job['status'] in FINISHED_STATES:
+            st.session_state.quiz_submitted = False
+            st.session_state.quiz_generated = st.session_state.quiz_manager.load_questions(
+                job_queue.questions(job['id']), job['shortfall'], job['topic']
+            )
+            if not st.session_state.quiz_generated:
+                st.error(f"Error generating questions: {job['error'] or job['status']}")
+            elif job['error']:
+                st.warning(f"Generation stopped early: {job['error']}")
+            st.session_state.job_id = None
+            st.query_params.pop('job', None)
+        elif job_queue.fail_stale(job['id']):
+            # No worker has touched the job for a while; stop waiting for it
+            rerun()
+        else:
+            st.progress(
+                job['completed'] / job['num_questions'],
+                text=f"Generating {job['topic']} quiz: {job['completed']} of {job['num_questions']} questions ready ({job['status']})"
             )
-            st.rerun()
+            if st.button("Cancel Generation"):
+                job_queue.cancel(job['id'])
+            time.sleep(1)
+            rerun()
 
     # Display quiz if generated
     if st.session_state.quiz_generated and st.session_state.quiz_manager.questions:
+        # In an exam room the quiz details come from the room, not the sidebar
+        exam_room = get_room(st.session_state.quiz_manager.room_code) if st.session_state.quiz_manager.room_code else None
+        if exam_room is not None:
+            topic, difficulty = exam_room.topic, exam_room.difficulty
         st.markdown('<div class="content-card">', unsafe_allow_html=True)
         st.markdown(f'''
         <div style="display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px;">
@@ -496,39 +693,86 @@ with content_col:
                 {difficulty} Level
             </div>
         </div>
-        <p>Complete all {num_questions} questions and submit your answers. For multiple choice questions, select one option.</p>
+        <p>Complete all {len(st.session_state.quiz_manager.questions)} questions and submit your answers. For multiple choice questions, select one option.</p>
         <div style="height: 3px; width: 100px; background: linear-gradient(90deg, #3b82f6, #93c5fd); margin: 15px 0;"></div>
         ''', unsafe_allow_html=True)
         
+        # Partial quiz notice when generation stopped early
+        shortfall = st.session_state.quiz_manager.shortfall
+        if shortfall and shortfall['missing']:
+            reasons = {'deadline': 'the time limit was reached', 'cancelled': 'generation was cancelled', 'errors': 'some questions failed validation', 'duplicates': 'the model kept repeating itself'}
+            st.warning(f"Only {shortfall['generated']} of {shortfall['requested']} questions were generated because {reasons.get(shortfall['reason'], shortfall['reason'])}.")
+        
         # IMPORTANT: We must call attempt_quiz() to create and gather the current answers
-        st.session_state.quiz_manager.attempt_quiz()
+        with profiler.phase("quiz render"):
+            st.session_state.quiz_manager.attempt_quiz()
         
         st.markdown('<div class="submit-button">', unsafe_allow_html=True)
         submit_quiz = st.button("Submit Quiz", use_container_width=True)
         st.markdown('</div>', unsafe_allow_html=True)
         
+        # Instructor tools are hidden from candidates sitting a room's quiz
+        if st.session_state.quiz_manager.room_code is None:
+            # One generated quiz shared with every candidate who enters the code
+            with st.expander("Exam Room"):
+                if st.button("Open Exam Room", use_container_width=True):
+                    st.session_state.quiz_manager.hosted_room_code = create_room(
+                        st.session_state.quiz_manager.questions, topic, difficulty
+                    ).code
+                if st.session_state.quiz_manager.hosted_room_code:
+                    st.success(f"Exam room code: {st.session_state.quiz_manager.hosted_room_code}")
+            
+            # Paper-based exams: shuffled per-candidate PDFs and answer keys
+            with st.expander("Printable Exam Papers"):
+                paper_count = st.number_input("Number of candidates", min_value=1, max_value=5000, value=30)
+                if st.button("Render Papers", use_container_width=True):
+                    with st.spinner("Rendering exam papers..."):
+                        from datetime import datetime
+                        out_dir = os.path.join('papers', datetime.now().strftime("%Y%m%d_%H%M%S"))
+                        report = render_papers(
+                            st.session_state.quiz_manager.questions, paper_count, out_dir,
+                            title=f"{topic} Quiz", subtitle=f"{difficulty} Level"
+                        )
+                        st.session_state.papers_zip = shutil.make_archive(out_dir, 'zip', out_dir)
+                    st.success(f"Rendered {report['papers']} papers ({report['pages']} pages) at {report['pages_per_second']} pages/s")
+                shortfall = st.session_state.quiz_manager.shortfall
+                if shortfall and shortfall.get('stems_per_call'):
+                    st.caption(f"Per LLM call: {shortfall['stems_per_call']} distinct question stems, "
+                               f"{shortfall['option_orders_per_call']} option orders")
+                if st.session_state.get('papers_zip'):
+                    with open(st.session_state.papers_zip, 'rb') as f:
+                        st.download_button(
+                            label="Download Papers",
+                            data=f.read(),
+                            file_name=os.path.basename(st.session_state.papers_zip),
+                            mime='application/zip',
+                            use_container_width=True
+                        )
+        
         st.markdown('</div>', unsafe_allow_html=True)
         
         if submit_quiz:
-            # First, save the current state from radio buttons into the user_answers
-            for i, q in enumerate(st.session_state.quiz_manager.questions):
-                if q['type'] == 'MCQ':
-                    radio_key = f"mcq_selection_{i}"
-                    st.session_state.quiz_manager.user_answers[i] = st.session_state[radio_key]
-                else:
-                    st.session_state.quiz_manager.user_answers[i] = st.session_state[f"fill_blank_{i}"]
+            with profiler.phase("evaluate"):
+                # First, save the current state from radio buttons into the user_answers
+                for i, q in enumerate(st.session_state.quiz_manager.questions):
+                    if q['type'] == 'MCQ':
+                        radio_key = f"mcq_selection_{i}"
+                        st.session_state.quiz_manager.user_answers[i] = st.session_state[radio_key]
+                    else:
+                        st.session_state.quiz_manager.user_answers[i] = st.session_state[f"fill_blank_{i}"]
             
-            # Now evaluate with the updated answers
-            st.session_state.quiz_manager.evaluate_quiz()
-            st.session_state.quiz_submitted = True
-            st.rerun()
+                # Now evaluate with the updated answers
+                st.session_state.quiz_manager.evaluate_quiz()
+                st.session_state.quiz_submitted = True
+                rerun()
 
     # Display results if quiz submitted
     if st.session_state.quiz_submitted:
         st.markdown('<div class="content-card">', unsafe_allow_html=True)
         st.markdown('<h2>Quiz Results</h2>', unsafe_allow_html=True)
         
-        results_df = st.session_state.quiz_manager.generate_result_dataframe()
+        with profiler.phase("results dataframe"):
+            results_df = st.session_state.quiz_manager.generate_result_dataframe()
         
         if not results_df.empty:
             correct_count = results_df['is_correct'].sum()
@@ -545,39 +789,44 @@ with content_col:
             """, unsafe_allow_html=True)
             
             # Question results
-            for _, result in results_df.iterrows():
-                if result['is_correct']:
-                    st.markdown(f"""
-                    <div class="correct-answer">
-                        <div class="result-question">Question {result['question_number']}</div>
-                        <p>{result['question']}</p>
-                        <div class="answer-detail">
-                            <strong>Your Answer:</strong> {result['user_answer']}
-                        </div>
-                    </div>
-                    """, unsafe_allow_html=True)
-                else:
-                    st.markdown(f"""
-                    <div class="incorrect-answer">
-                        <div class="result-question">Question {result['question_number']}</div>
-                        <p>{result['question']}</p>
-                        <div class="answer-detail">
-                            <strong>Your Answer:</strong> {result['user_answer']}
+            with profiler.phase("results render"):
+                for _, result in results_df.iterrows():
+                    if result['is_correct']:
+                        st.markdown(f"""
+                        <div class="correct-answer">
+                            <div class="result-question">Question {result['question_number']}</div>
+                            <p>{result['question']}</p>
+                            <div class="answer-detail">
+                                <strong>Your Answer:</strong> {result['user_answer']}
+                            </div>
                         </div>
-                        <div class="answer-detail" style="background-color: rgba(16, 185, 129, 0.1);">
-                            <strong>Correct Answer:</strong> {result['correct_answer']}
+                        """, unsafe_allow_html=True)
+                    else:
+                        st.markdown(f"""
+                        <div class="incorrect-answer">
+                            <div class="result-question">Question {result['question_number']}</div>
+                            <p>{result['question']}</p>
+                            <div class="answer-detail">
+                                <strong>Your Answer:</strong> {result['user_answer']}
+                            </div>
+                            <div class="answer-detail" style="background-color: rgba(16, 185, 129, 0.1);">
+                                <strong>Correct Answer:</strong> {result['correct_answer']}
+                            </div>
                         </div>
-                    </div>
-                    """, unsafe_allow_html=True)
+                        """, unsafe_allow_html=True)
             
             # Save and download options
+            candidate_name = st.text_input("Name for the leaderboard (optional)")
             col1, col2 = st.columns(2)
             with col1:
                 if st.button("Save Results", use_container_width=True):
-                    saved_file = st.session_state.quiz_manager.save_to_csv()
+                    saved_file = st.session_state.quiz_manager.save_to_csv(candidate_name or None)
                     if saved_file:
                         st.session_state.saved_file_path = saved_file
-                        st.rerun()
+                        rerun()
+                # Kept on the manager so it survives the rerun above
+                if st.session_state.quiz_manager.save_warning:
+                    st.warning(st.session_state.quiz_manager.save_warning)
             
             with col2:
                 if 'saved_file_path' in st.session_state and st.session_state.saved_file_path:
@@ -613,4 +862,6 @@ with content_col:
         </div>
         <p style="font-style: italic; color: #4b5563;">Perfect for exam preparation and self-assessment</p>
         """, unsafe_allow_html=True)
-        st.markdown('</div>', unsafe_allow_html=True)
\ No newline at end of file
+        st.markdown('</div>', unsafe_allow_html=True)
+
+profiler.finish()
@@ -0,0 +1,257 @@
+# Printable exam papers
+# Renders one generated quiz into per-candidate PDF papers and answer keys,
+# each with its own question and option order, using PyMuPDF.
+# The page header (logo, title, candidate fields) is drawn once into a
+# template PDF that every worker process stamps onto its pages.
+#
+# Usage:  python paper_render.py quiz.json --candidates 1000 --out papers
+import os
+import sys
+import csv
+import json
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+import fitz  # PyMuPDF
+from variants import exam_stems, candidate_quiz, negate_stem
+
+PAGE_WIDTH, PAGE_HEIGHT = fitz.paper_size('a4')
+MARGIN = 50
+HEADER_HEIGHT = 130
+FOOTER_HEIGHT = 30
+FONT = 'helv'
+BOLD_FONT = 'hebo'
+LOGO_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'NIELIT_Logo.jpg')
+OPTION_LABELS = 'ABCDEFGH'
+
+
+def build_template(title, subtitle=""):
+    """Draw the shared page header once and return it as PDF bytes"""
+    doc = fitz.open()
+    page = doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+    text_left = MARGIN
+    if os.path.exists(LOGO_PATH):
+        page.insert_image(fitz.Rect(MARGIN, 30, MARGIN + 60, 90), filename=LOGO_PATH, keep_proportion=True)
+        text_left = MARGIN + 75
+    page.insert_text((text_left, 52), title, fontname=BOLD_FONT, fontsize=16)
+    if subtitle:
+        page.insert_text((text_left, 72), subtitle, fontname=FONT, fontsize=10)
+    page.insert_text((MARGIN, 112), "Name: ______________________________", fontname=FONT, fontsize=10)
+    page.insert_text((PAGE_WIDTH / 2 + 20, 112), "Roll No: __________________", fontname=FONT, fontsize=10)
+    page.draw_line((MARGIN, HEADER_HEIGHT - 6), (PAGE_WIDTH - MARGIN, HEADER_HEIGHT - 6), width=0.8)
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def wrap_text(text, width, font, fontsize=11):
+    """Split text into lines that fit the given width"""
+    lines = []
+    for paragraph in str(text).splitlines() or [""]:
+        line = ""
+        for word in paragraph.split():
+            candidate = f"{line} {word}" if line else word
+            if font.text_length(candidate, fontsize=fontsize) <= width or not line:
+                line = candidate
+            else:
+                lines.append(line)
+                line = word
+        lines.append(line)
+    return lines
+
+
+# Hanging indents: numbers and option labels sit left of the wrapped text,
+# so a question wraps the same way whatever position it lands in
+NUMBER_INDENT = 24
+OPTION_INDENT = 24
+OPTION_TEXT_INDENT = 46
+FONT_SIZE = 11
+LINE_HEIGHT = FONT_SIZE * 1.3
+
+
+def layout_question(question, fonts):
+    """
+    Wrap one question's text, options and answer once
+    Measuring text is by far the slowest part of rendering, so every worker
+    does it once per question and reuses the lines for every candidate
+    """
+    width = PAGE_WIDTH - 2 * MARGIN
+    layout = {
+        'question': wrap_text(question['question'], width - NUMBER_INDENT, fonts['bold'], FONT_SIZE),
+        'answer': wrap_text(question['correct_answer'], width - OPTION_TEXT_INDENT, fonts['regular'], FONT_SIZE),
+    }
+    if question['type'] == 'MCQ':
+        layout['options'] = {
+            option: wrap_text(option, width - OPTION_TEXT_INDENT, fonts['regular'], FONT_SIZE)
+            for option in question['options']
+        }
+        inverted = negate_stem(question['question'])
+        if inverted:
+            layout['inverted'] = wrap_text(inverted, width - NUMBER_INDENT, fonts['bold'], FONT_SIZE)
+    return layout
+
+
+class _PaperWriter:
+    # Flows text down the page, starting a new templated page when full.
+    # Text for each page is collected in one TextWriter and written at once.
+    def __init__(self, template, fonts, candidate_label):
+        self.doc = fitz.open()
+        self.template = template
+        self.fonts = fonts
+        self.candidate_label = candidate_label
+        self.page = None
+        self.writer = None
+        self.y = 0
+        self.new_page()
+
+    def _flush(self):
+        if self.writer is not None:
+            self.writer.write_text(self.page)
+
+    def new_page(self):
+        self._flush()
+        self.page = self.doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        self.page.show_pdf_page(self.page.rect, self.template, 0)
+        self.writer = fitz.TextWriter(self.page.rect)
+        footer = f"{self.candidate_label}  |  Page {self.doc.page_count}"
+        self.writer.append((MARGIN, PAGE_HEIGHT - FOOTER_HEIGHT + 10), footer,
+                           font=self.fonts['regular'], fontsize=8)
+        self.y = HEADER_HEIGHT + 10
+
+    def block(self, lines, prefix="", indent=0, text_indent=0, bold=False, gap=4):
+        # Keep a block on one page when it fits
+        font = self.fonts['bold' if bold else 'regular']
+        if self.y + len(lines) * LINE_HEIGHT > PAGE_HEIGHT - MARGIN - FOOTER_HEIGHT and self.y > HEADER_HEIGHT + 10:
+            self.new_page()
+        for i, line in enumerate(lines):
+            self.y += LINE_HEIGHT
+            if i == 0 and prefix:
+                self.writer.append((MARGIN + indent, self.y), prefix, font=font, fontsize=FONT_SIZE)
+            self.writer.append((MARGIN + text_indent, self.y), line, font=font, fontsize=FONT_SIZE)
+        self.y += gap
+
+    def save(self, path):
+        self._flush()
+        self.doc.save(path, garbage=1, deflate=True)
+        pages = self.doc.page_count
+        self.doc.close()
+        return pages
+
+
+# Per-process state set once by the pool initializer
+_worker = {}
+
+
+def _init_worker(template_bytes, questions, out_dir, seed, invert):
+    fonts = {'regular': fitz.Font(FONT), 'bold': fitz.Font(BOLD_FONT)}
+    _worker['template'] = fitz.open("pdf", template_bytes)
+    _worker['fonts'] = fonts
+    _worker['layouts'] = [layout_question(q, fonts) for q in questions]
+    # Same stems on every paper (deterministic, so every worker agrees)
+    _worker['stems'] = exam_stems(questions, seed, invert)
+    _worker['out_dir'] = out_dir
+    _worker['seed'] = seed
+
+
+def answer_key(variant):
+    """Answer key rows for a candidate's variant: (number, option label, answer, source index)"""
+    rows = []
+    for number, question in enumerate(variant, 1):
+        label = ""
+        if question['type'] == 'MCQ':
+            label = OPTION_LABELS[question['options'].index(question['correct_answer'])]
+        rows.append((number, label, question['correct_answer'], question['source_index']))
+    return rows
+
+
+def render_candidate(candidate):
+    """Render paper_NNNN.pdf and key_NNNN.pdf for one candidate; returns (pages, key rows)"""
+    fonts = _worker['fonts']
+    variant = candidate_quiz(_worker['stems'], f"{_worker['seed']}:{candidate}")
+    label = f"Candidate {candidate:04d}"
+
+    paper = _PaperWriter(_worker['template'], fonts, label)
+    for number, question in enumerate(variant, 1):
+        layout = _worker['layouts'][question['source_index']]
+        lines = layout['inverted'] if question.get('variant') == 'inverted' else layout['question']
+        paper.block(lines, prefix=f"{number}.", text_indent=NUMBER_INDENT, bold=True, gap=2)
+        if question['type'] == 'MCQ':
+            for label_char, option in zip(OPTION_LABELS, question['options']):
+                paper.block(layout['options'][option], prefix=f"({label_char})",
+                            indent=OPTION_INDENT, text_indent=OPTION_TEXT_INDENT, gap=0)
+        else:
+            paper.block(["Answer: ________________________________"], text_indent=OPTION_INDENT, gap=0)
+        paper.y += 10
+    pages = paper.save(os.path.join(_worker['out_dir'], f"paper_{candidate:04d}.pdf"))
+
+    rows = answer_key(variant)
+    key = _PaperWriter(_worker['template'], fonts, f"{label} - Answer Key")
+    for number, option_label, answer, source_index in rows:
+        prefix = f"{number}. {option_label}" if option_label else f"{number}."
+        layout = _worker['layouts'][source_index]
+        # Inverted variants are keyed to one of the original distractors
+        lines = layout['options'][answer] if option_label else layout['answer']
+        key.block(lines, prefix=prefix,
+                  text_indent=OPTION_TEXT_INDENT, gap=0)
+    pages += key.save(os.path.join(_worker['out_dir'], f"key_{candidate:04d}.pdf"))
+    return pages, [(candidate,) + row for row in rows]
+
+
+def render_papers(questions, num_candidates, out_dir, title="NIELIT Examination", subtitle="",
+                  workers=None, seed=0, invert=False):
+    """
+    Render papers and answer keys for num_candidates candidates
+    Candidates are split across a process pool; each worker receives the
+    template and quiz once, then only candidate numbers. Writes
+    answer_keys.csv alongside the PDFs and returns a report with pages/second.
+    invert=True asks every safely invertible question as the same two-option
+    "which is NOT" pair on all papers; only the order differs per candidate.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    started = time.perf_counter()
+    template = build_template(title, subtitle)
+    workers = workers or os.cpu_count() or 1
+    candidates = range(1, num_candidates + 1)
+    chunksize = max(1, num_candidates // (workers * 4))
+    total_pages = 0
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(template, list(questions), out_dir, seed, invert)) as pool, \
+            open(os.path.join(out_dir, 'answer_keys.csv'), 'w', newline='', encoding='utf-8') as f:
+        writer = csv.writer(f)
+        writer.writerow(['candidate', 'question_number', 'option', 'answer', 'source_question'])
+        for pages, rows in pool.map(render_candidate, candidates, chunksize=chunksize):
+            total_pages += pages
+            writer.writerows((c, n, o, a, s + 1) for c, n, o, a, s in rows)
+    seconds = time.perf_counter() - started
+    return {
+        'papers': num_candidates,
+        'pages': total_pages,
+        'seconds': round(seconds, 3),
+        'pages_per_second': round(total_pages / seconds, 1) if seconds else None,
+        'out_dir': out_dir,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Render shuffled exam papers and answer keys from a quiz")
+    parser.add_argument('quiz', help="JSON file with a list of quiz questions")
+    parser.add_argument('--candidates', type=int, default=100)
+    parser.add_argument('--out', default='papers')
+    parser.add_argument('--title', default="NIELIT Examination")
+    parser.add_argument('--subtitle', default="")
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--seed', default=0)
+    parser.add_argument('--invert', action='store_true', help="Ask invertible questions as \"which is NOT\" pairs")
+    args = parser.parse_args(argv)
+
+    with open(args.quiz, encoding='utf-8') as f:
+        questions = json.load(f)
+    report = render_papers(questions, args.candidates, args.out, args.title, args.subtitle,
+                           workers=args.workers, seed=args.seed, invert=args.invert)
+    print(f"Rendered {report['papers']} papers ({report['pages']} pages) in {report['seconds']}s "
+          f"- {report['pages_per_second']} pages/s")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,153 @@
+# Opt-in per-rerun profiling for the Streamlit script
+# Enable with MCQ_PROFILE=1 or by opening the app with ?profile=1
+# Each rerun writes a cProfile dump plus phase timings to PROFILE_DIR, and
+# summary.json keeps the slowest reruns seen so far
+import os
+import io
+import json
+import time
+import pstats
+import cProfile
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+PROFILE_DIR = os.getenv('MCQ_PROFILE_DIR', 'profiles')
+SUMMARY_SIZE = 20
+# Session state key holding the profiler of the run in progress
+STATE_KEY = '_rerun_profiler'
+_TRUE_VALUES = ('1', 'true', 'yes', 'on')
+
+# Reruns from different sessions finish on different threads
+_summary_lock = threading.Lock()
+
+
+def profiling_requested(query_params=None):
+    """True if profiling is switched on by environment variable or query parameter"""
+    if os.getenv('MCQ_PROFILE', '').lower() in _TRUE_VALUES:
+        return True
+    if query_params is not None:
+        return str(query_params.get('profile', '')).lower() in _TRUE_VALUES
+    return False
+
+
+class RerunProfiler:
+    def __init__(self, label="rerun", out_dir=PROFILE_DIR, summary_size=SUMMARY_SIZE):
+        """
+        Deterministic profiler around one script run
+        - label: included in file names (e.g. the session id)
+        - out_dir: where .prof, .json and .txt files are written
+        - summary_size: number of slowest reruns kept in summary.json
+        """
+        self.label = label
+        self.out_dir = out_dir
+        self.summary_size = summary_size
+        self.phases = {}
+        self._open_phases = {}
+        self._finished = False
+        self.started_at = datetime.now()
+        self._start = time.perf_counter()
+        # Last phase boundary; where an interrupted run is taken to have ended
+        self._last_activity = self._start
+        self._profile = cProfile.Profile()
+        try:
+            self._profile.enable()
+        except ValueError:
+            # Another profiler is already active on this thread
+            self._profile = None
+
+    @contextmanager
+    def phase(self, name):
+        """Time a named section of the script; repeated names accumulate"""
+        start = time.perf_counter()
+        self._open_phases[name] = start
+        self._last_activity = start
+        try:
+            yield
+        finally:
+            # finish() may already have closed this phase (e.g. on st.rerun)
+            end = time.perf_counter()
+            if self._open_phases.pop(name, None) is not None and not self._finished:
+                self.phases[name] = self.phases.get(name, 0.0) + end - start
+                self._last_activity = end
+
+    def finish(self, interrupted=False):
+        """
+        Stop profiling and write this rerun's files; safe to call more than once
+        interrupted marks a run that ended without reaching finish() itself
+        (an exception, st.stop() or a rerun triggered by a widget). Such a
+        run is finished at the start of the next one, so its clock stops at
+        its last phase boundary rather than including the idle time between.
+        """
+        if self._finished:
+            return None
+        now = self._last_activity if interrupted else time.perf_counter()
+        for name, start in self._open_phases.items():
+            self.phases[name] = self.phases.get(name, 0.0) + now - start
+        self._open_phases.clear()
+        self._finished = True
+        total = now - self._start
+        if self._profile is not None:
+            self._profile.disable()
+
+        os.makedirs(self.out_dir, exist_ok=True)
+        stem = f"{self.started_at.strftime('%Y%m%d_%H%M%S_%f')}_{self.label}"
+        base = os.path.join(self.out_dir, stem)
+        entry = {
+            'rerun': stem,
+            'started': self.started_at.isoformat(timespec='seconds'),
+            'total_seconds': round(total, 4),
+            'phases': {name: round(seconds, 4) for name, seconds in self.phases.items()},
+            'interrupted': interrupted,
+        }
+        if self._profile is not None:
+            self._profile.dump_stats(base + '.prof')
+            # Human-readable top functions next to the raw dump
+            text = io.StringIO()
+            pstats.Stats(self._profile, stream=text).sort_stats('cumulative').print_stats(30)
+            with open(base + '.txt', 'w', encoding='utf-8') as f:
+                f.write(text.getvalue())
+        with open(base + '.json', 'w', encoding='utf-8') as f:
+            json.dump(entry, f, indent=2)
+        self._update_summary(entry)
+        return entry
+
+    def _update_summary(self, entry):
+        path = os.path.join(self.out_dir, 'summary.json')
+        with _summary_lock:
+            try:
+                with open(path, encoding='utf-8') as f:
+                    slowest = json.load(f)
+            except (FileNotFoundError, json.JSONDecodeError):
+                slowest = []
+            slowest.append(entry)
+            slowest.sort(key=lambda e: e['total_seconds'], reverse=True)
+            with open(path, 'w', encoding='utf-8') as f:
+                json.dump(slowest[:self.summary_size], f, indent=2)
+
+
+class NullProfiler:
+    # Same interface as RerunProfiler, used when profiling is off
+    @contextmanager
+    def phase(self, name):
+        yield
+
+    def finish(self, interrupted=False):
+        return None
+
+
+def start_rerun_profile(enabled, label="rerun", state=None):
+    """
+    Return a running RerunProfiler when enabled, otherwise a no-op profiler
+    state (st.session_state) keeps the live profiler between runs: a run
+    that stopped before calling finish() leaves its profiler there, and it
+    is finished here so its hook is removed and its data still written
+    """
+    if state is not None:
+        leftover = state.get(STATE_KEY)
+        if leftover is not None:
+            leftover.finish(interrupted=True)
+    profiler = RerunProfiler(label=label) if enabled else NullProfiler()
+    if state is not None:
+        state[STATE_KEY] = profiler
+    return profiler
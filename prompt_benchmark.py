@@ -0,0 +1,109 @@
+# Prompt variant benchmark
+# Generates the same questions with each prompt variant and compares input
+# tokens, latency and validation pass rate, so the cheapest prompt that keeps
+# question quality can be made the default (MCQ_PROMPT_VARIANT).
+#
+# Usage:  python prompt_benchmark.py --samples 20 --topics "Operating System" DBMS
+#         python prompt_benchmark.py --dry-run     (prompt sizes only, no API calls)
+import sys
+import json
+import time
+import argparse
+from prompts import TEMPLATES, get_prompt, prompt_variants
+
+PROMPTS = {'mcq': 'generate_mcq', 'fill_blank': 'generate_fill_blank'}
+
+
+def estimate_tokens(text):
+    # Rough count for offline comparisons (about 4 characters per token)
+    return max(1, round(len(text) / 4))
+
+
+def prompt_sizes(name, topics, difficulty):
+    """Characters and estimated tokens of each variant's formatted prompt"""
+    sizes = {}
+    for variant in prompt_variants(name):
+        prompt = get_prompt(name, variant)
+        texts = [prompt.format(topic=topic, difficulty=difficulty, focus="") for topic in topics]
+        chars = sum(len(text) for text in texts) / len(texts)
+        sizes[variant] = {'prompt': prompt.key, 'chars': round(chars),
+                          'estimated_tokens': round(sum(estimate_tokens(t) for t in texts) / len(texts))}
+    return sizes
+
+
+def run_variant(name, variant, topics, difficulty, samples):
+    """Generate samples single-attempt questions per topic with one variant"""
+    from utils import QuestionGenerator
+    from llm_scheduler import Priority
+
+    generator = QuestionGenerator(session_id="prompt-benchmark", priority=Priority.BULK,
+                                  prompt_variant=variant)
+    generate = getattr(generator, PROMPTS[name])
+    latencies = []
+    errors = []
+    for topic in topics:
+        for _ in range(samples):
+            started = time.perf_counter()
+            try:
+                generate(topic, difficulty, max_attempts=1)
+            except Exception as e:
+                errors.append(str(e))
+            latencies.append(time.perf_counter() - started)
+    latencies.sort()
+    calls = generator.calls or 1
+    return {
+        'prompt': get_prompt(name, variant).key,
+        'calls': generator.calls,
+        'pass_rate': round(generator.accepted / calls, 3),
+        'input_tokens_per_call': round(generator.input_tokens / calls, 1),
+        'output_tokens_per_call': round(generator.output_tokens / calls, 1),
+        'mean_latency': round(sum(latencies) / len(latencies), 3),
+        'p95_latency': round(latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))], 3),
+        'errors': errors[:5],
+    }
+
+
+def recommend(results, tolerance):
+    """Cheapest variant whose pass rate is within tolerance of the best one"""
+    best = max(r['pass_rate'] for r in results.values())
+    eligible = [v for v, r in results.items() if r['pass_rate'] >= best - tolerance]
+    return min(eligible, key=lambda v: results[v]['input_tokens_per_call'])
+
+
+def main(argv=None):
+    names = sorted({name for name, _ in TEMPLATES if name in PROMPTS})
+    parser = argparse.ArgumentParser(description="Compare prompt variants on tokens, latency and pass rate")
+    parser.add_argument('--prompts', nargs='+', default=names, choices=names)
+    parser.add_argument('--topics', nargs='+', default=["Operating System", "DBMS", "Computer Networks"])
+    parser.add_argument('--difficulty', default='medium')
+    parser.add_argument('--samples', type=int, default=10, help="Questions per topic and variant")
+    parser.add_argument('--tolerance', type=float, default=0.05, help="Pass-rate drop accepted for a cheaper prompt")
+    parser.add_argument('--dry-run', action='store_true', help="Only compare prompt sizes")
+    parser.add_argument('--json', help="Also write the results to this file")
+    args = parser.parse_args(argv)
+
+    report = {}
+    for name in args.prompts:
+        report[name] = {'sizes': prompt_sizes(name, args.topics, args.difficulty)}
+        for variant, size in report[name]['sizes'].items():
+            print(f"{size['prompt']:<24} {size['chars']:>5} chars  ~{size['estimated_tokens']} tokens")
+        if args.dry_run:
+            continue
+        results = {}
+        for variant in prompt_variants(name):
+            results[variant] = run_variant(name, variant, args.topics, args.difficulty, args.samples)
+            r = results[variant]
+            print(f"{r['prompt']:<24} {r['input_tokens_per_call']:>7} in-tokens/call  "
+                  f"pass {r['pass_rate']:.0%}  mean {r['mean_latency']}s  p95 {r['p95_latency']}s")
+        report[name]['results'] = results
+        report[name]['recommended'] = recommend(results, args.tolerance)
+        print(f"Recommended for {name}: {report[name]['recommended']}")
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
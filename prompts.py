@@ -0,0 +1,116 @@
+# Prompt assets
+# Prompt templates and output parsers are built once per process and shared,
+# instead of being rebuilt on every generation attempt. Each prompt has
+# versioned variants: 'full' is the original wording with a worked example,
+# 'compact' states the JSON shape inline and costs far fewer input tokens.
+# Select a variant with MCQ_PROMPT_VARIANT or QuestionGenerator(prompt_variant=...)
+# and compare them with prompt_benchmark.py before switching the default.
+import os
+import threading
+from langchain.prompts import PromptTemplate
+from langchain.output_parsers import PydanticOutputParser
+
+DEFAULT_VARIANT = os.getenv('MCQ_PROMPT_VARIANT', 'full')
+
+# (prompt name, variant) -> (version, output model name in utils, template)
+# Bump the version whenever a template's wording changes, so benchmark
+# results and logs can tell prompts apart
+TEMPLATES = {
+    ('mcq', 'full'): (1, 'MCQQuestion', (
+        "Generate a {difficulty} multiple-choice question about {topic}.{focus}\n\n"
+        "Return ONLY a JSON object with these exact fields:\n"
+        "- 'question': A clear, specific question\n"
+        "- 'options': An array of exactly 4 possible answers\n"
+        "- 'correct_answer': One of the options that is the correct answer\n\n"
+        "Example format:\n"
+        '{{\n'
+        '    "question": "What is the capital of France?",\n'
+        '    "options": ["London", "Berlin", "Paris", "Madrid"],\n'
+        '    "correct_answer": "Paris"\n'
+        '}}\n\n'
+        "Your response:"
+    )),
+    ('mcq', 'compact'): (1, 'MCQQuestion', (
+        "Write a {difficulty} multiple-choice question about {topic}.{focus}\n"
+        'Reply with JSON only: {{"question": "...", "options": [4 answers], '
+        '"correct_answer": "<the correct option, copied exactly>"}}'
+    )),
+    ('fill_blank', 'full'): (1, 'FillBlankQuestion', (
+        "Generate a {difficulty} fill-in-the-blank question about {topic}.{focus}\n\n"
+        "Return ONLY a JSON object with these exact fields:\n"
+        "- 'question': A sentence with '_____' marking where the blank should be\n"
+        "- 'answer': The correct word or phrase that belongs in the blank\n\n"
+        "Example format:\n"
+        '{{\n'
+        '    "question": "The capital of France is _____.",\n'
+        '    "answer": "Paris"\n'
+        '}}\n\n'
+        "Your response:"
+    )),
+    ('fill_blank', 'compact'): (1, 'FillBlankQuestion', (
+        "Write a {difficulty} fill-in-the-blank sentence about {topic}.{focus}\n"
+        'Reply with JSON only: {{"question": "sentence with _____ as the blank", "answer": "..."}}'
+    )),
+    ('subtopics', 'full'): (1, 'SubtopicPlan', (
+        "List {count} distinct, specific subtopics of {topic} suitable for "
+        "{difficulty} quiz questions. Each subtopic should cover a different fact or concept.\n\n"
+        "Return ONLY a JSON object of the form {{\"subtopics\": [\"...\", \"...\"]}}\n\n"
+        "Your response:"
+    )),
+    ('subtopics', 'compact'): (1, 'SubtopicPlan', (
+        "List {count} distinct subtopics of {topic} for {difficulty} quiz questions.\n"
+        'Reply with JSON only: {{"subtopics": ["...", "..."]}}'
+    )),
+}
+
+
+class PromptAsset:
+    __slots__ = ('name', 'variant', 'version', 'template', 'parser', '_text')
+
+    def __init__(self, name, variant, version, template, parser):
+        """A built prompt template and its output parser"""
+        self.name = name
+        self.variant = variant
+        self.version = version
+        self.template = template
+        self.parser = parser
+        self._text = template.template
+
+    @property
+    def key(self):
+        """Identifier such as 'mcq/compact@1'"""
+        return f"{self.name}/{self.variant}@{self.version}"
+
+    def format(self, **kwargs):
+        # Same output as self.template.format() (an f-string template)
+        # without re-validating the input variables on every call
+        return self._text.format(**kwargs)
+
+    def parse(self, text):
+        return self.parser.parse(text)
+
+
+_assets = {}
+_assets_lock = threading.Lock()
+
+
+def prompt_variants(name):
+    """Variants registered for a prompt"""
+    return [variant for prompt, variant in TEMPLATES if prompt == name]
+
+
+def get_prompt(name, variant=None):
+    """Shared PromptAsset for a prompt name ('mcq', 'fill_blank', 'subtopics')"""
+    variant = variant or DEFAULT_VARIANT
+    if (name, variant) not in TEMPLATES:
+        raise KeyError(f"Unknown prompt {name!r} variant {variant!r}; available: {prompt_variants(name)}")
+    asset = _assets.get((name, variant))
+    if asset is None:
+        # Output models live in utils, which imports this module
+        import utils
+        version, model_name, text = TEMPLATES[(name, variant)]
+        template = PromptTemplate.from_template(text)
+        parser = PydanticOutputParser(pydantic_object=getattr(utils, model_name))
+        with _assets_lock:
+            asset = _assets.setdefault((name, variant), PromptAsset(name, variant, version, template, parser))
+    return asset
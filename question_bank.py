@@ -0,0 +1,367 @@
+# Offline question bank
+# A compact, memory-mapped file of pre-built questions that can stand in for
+# QuestionGenerator when there is no LLM (or no network) available
+#
+# File layout (all integers little-endian):
+#   header   magic 'MCQB', version, record count, offset table position,
+#            index position and index length
+#   records  one per question: kind, option count, correct option, then
+#            length-prefixed UTF-8 strings (question, options / answer)
+#   offsets  one u64 per record, grouped by (topic, type, difficulty)
+#   index    JSON mapping each normalised (topic, type, difficulty) key to
+#            [start, count, topic, difficulty]: the slice of the offset table
+#            holding its records and the topic / difficulty as first written
+import os
+import sys
+import mmap
+import json
+import struct
+import random
+import argparse
+import threading
+from utils import MCQQuestion, FillBlankQuestion, check_cancelled
+from dedup import NearDuplicateIndex, question_text
+
+MAGIC = b'MCQB'
+VERSION = 1
+HEADER = struct.Struct('<4sHHQQQQ')
+RECORD_HEAD = struct.Struct('<BBB')
+STRING_LEN = struct.Struct('<H')
+OFFSET = struct.Struct('<Q')
+
+# Option count and correct index are stored in one byte each
+MAX_OPTIONS = 0xFF
+
+KIND_MCQ = 0
+KIND_FILL_BLANK = 1
+TYPE_NAMES = {KIND_MCQ: 'MCQ', KIND_FILL_BLANK: 'Fill in the Blank'}
+KEY_SEP = '\x1f'
+
+
+def bank_key(topic, question_type, difficulty):
+    """Normalised index key; question_type is 'MCQ' or 'Fill in the Blank'"""
+    if question_type == 'Multiple Choice':
+        question_type = 'MCQ'
+    return KEY_SEP.join([topic.strip().lower(), question_type, difficulty.strip().lower()])
+
+
+def _encode_string(text):
+    data = text.encode('utf-8')
+    if len(data) > 0xFFFF:
+        raise ValueError("String too long for question bank record")
+    return STRING_LEN.pack(len(data)) + data
+
+
+def encode_record(record):
+    """Encode one question dict (the QuizManager question structure) as bytes"""
+    if record['type'] == 'MCQ':
+        options = list(record['options'])
+        if not 0 < len(options) <= MAX_OPTIONS:
+            raise ValueError(f"MCQ must have 1 to {MAX_OPTIONS} options")
+        if record['correct_answer'] not in options:
+            raise ValueError("Correct answer not in options")
+        head = RECORD_HEAD.pack(KIND_MCQ, len(options), options.index(record['correct_answer']))
+        return head + b''.join(_encode_string(s) for s in [record['question']] + options)
+    head = RECORD_HEAD.pack(KIND_FILL_BLANK, 0, 0)
+    return head + _encode_string(record['question']) + _encode_string(record['correct_answer'])
+
+
+def _text_field(value, name):
+    # Required text: a missing or null value must not become the string "None"
+    if not isinstance(value, str) or not value.strip():
+        raise ValueError(f"'{name}' must be a non-empty string")
+    return value
+
+
+def _normalise_record(raw):
+    # Accept both the QuizManager structure and the raw Pydantic field names
+    if not isinstance(raw, dict):
+        raise TypeError("Question record must be a JSON object")
+    question_type = raw.get('type', 'MCQ')
+    if question_type in ('Multiple Choice', 'mcq'):
+        question_type = 'MCQ'
+    elif question_type in ('fill_blank', 'Fill in the blank'):
+        question_type = 'Fill in the Blank'
+    answer = raw.get('correct_answer', raw.get('answer'))
+    record = {
+        'type': question_type,
+        'question': _text_field(raw.get('question'), 'question'),
+        'correct_answer': str(answer) if answer is not None else '',
+        'topic': _text_field(raw.get('topic'), 'topic'),
+        'difficulty': _text_field(raw.get('difficulty', 'medium'), 'difficulty'),
+    }
+    if question_type == 'MCQ':
+        if not isinstance(raw.get('options'), (list, tuple)):
+            raise TypeError("'options' must be a list")
+        record['options'] = [str(o) for o in raw['options']]
+    if not record['question'] or not record['correct_answer']:
+        raise ValueError("Invalid question format")
+    return record
+
+
+def build_bank(records, path, dedup=False):
+    """
+    Write an iterable of question dicts to a bank file
+    Records are streamed to disk in input order; only their offsets are kept
+    in memory and sorted by key, so the offset table is grouped per key.
+    With dedup, near-duplicates of an already written question are skipped.
+    Returns (written, skipped).
+    """
+    key_ids = {}
+    # Topic and difficulty exactly as first seen for each key, for export
+    labels = {}
+    entries = []
+    skipped = 0
+    dedup_index = NearDuplicateIndex() if dedup else None
+    tmp_path = path + '.tmp'
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0, 0, 0))
+            for raw in records:
+                try:
+                    record = _normalise_record(raw)
+                    data = encode_record(record)
+                except (KeyError, ValueError, TypeError, struct.error):
+                    skipped += 1
+                    continue
+                if dedup_index is not None and dedup_index.check_and_add(question_text(record)):
+                    skipped += 1
+                    continue
+                key = bank_key(record['topic'], record['type'], record['difficulty'])
+                key_id = key_ids.setdefault(key, len(key_ids))
+                labels.setdefault(key, (record['topic'].strip(), record['difficulty'].strip()))
+                entries.append((key_id, f.tell()))
+                f.write(data)
+
+            # Offset table, 8-byte aligned u64 entries
+            f.write(b'\0' * (-f.tell() % OFFSET.size))
+            offsets_pos = f.tell()
+            entries.sort(key=lambda e: e[0])
+            index = {}
+            keys_by_id = {v: k for k, v in key_ids.items()}
+            for position, (key_id, offset) in enumerate(entries):
+                key = keys_by_id[key_id]
+                if key not in index:
+                    index[key] = [position, 0, *labels[key]]
+                index[key][1] += 1
+                f.write(OFFSET.pack(offset))
+
+            index_pos = f.tell()
+            index_data = json.dumps(index, separators=(',', ':')).encode('utf-8')
+            f.write(index_data)
+            f.seek(0)
+            f.write(HEADER.pack(MAGIC, VERSION, 0, len(entries), offsets_pos, index_pos, len(index_data)))
+        os.replace(tmp_path, path)
+    except BaseException:
+        # Never leave a half-written bank behind
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return len(entries), skipped
+
+
+class QuestionBank:
+    def __init__(self, path):
+        """
+        Open a bank file by memory mapping it
+        Only the header and the small key index are parsed up front; records
+        are decoded on demand straight from the mapping
+        """
+        self.path = path
+        self._file = open(path, 'rb')
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, _, count, offsets_pos, index_pos, index_len = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC or version != VERSION:
+            self.close()
+            raise ValueError(f"{path} is not a version {VERSION} question bank")
+        self.record_count = count
+        self._offsets_pos = offsets_pos
+        self.index = json.loads(self._mmap[index_pos:index_pos + index_len].decode('utf-8'))
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return self.record_count
+
+    def keys(self):
+        """List of (topic, type, difficulty) tuples present in the bank"""
+        return [tuple(key.split(KEY_SEP)) for key in self.index]
+
+    def count(self, topic, question_type, difficulty):
+        return self.index.get(bank_key(topic, question_type, difficulty), [0, 0])[1]
+
+    def _offset(self, position):
+        # Decoded explicitly so the little-endian table reads the same on any host
+        return OFFSET.unpack_from(self._mmap, self._offsets_pos + position * OFFSET.size)[0]
+
+    def _read_string(self, pos):
+        (length,) = STRING_LEN.unpack_from(self._mmap, pos)
+        pos += STRING_LEN.size
+        return self._mmap[pos:pos + length].decode('utf-8'), pos + length
+
+    def get(self, position):
+        """Decode the record at a position in the offset table"""
+        pos = self._offset(position)
+        kind, option_count, correct = RECORD_HEAD.unpack_from(self._mmap, pos)
+        pos += RECORD_HEAD.size
+        question, pos = self._read_string(pos)
+        if kind == KIND_MCQ:
+            options = []
+            for _ in range(option_count):
+                option, pos = self._read_string(pos)
+                options.append(option)
+            return {'type': 'MCQ', 'question': question, 'options': options,
+                    'correct_answer': options[correct]}
+        answer, pos = self._read_string(pos)
+        return {'type': 'Fill in the Blank', 'question': question, 'correct_answer': answer}
+
+    def positions(self, topic, question_type, difficulty):
+        """Range of offset table positions holding this key's records"""
+        start, count = self.index.get(bank_key(topic, question_type, difficulty), [0, 0])[:2]
+        return range(start, start + count)
+
+    def sample(self, topic, question_type, difficulty, k, rng=None):
+        """Draw k distinct questions for a key in O(k), without scanning the bank"""
+        positions = self.positions(topic, question_type, difficulty)
+        k = min(k, len(positions))
+        return [self.get(p) for p in (rng or random).sample(positions, k)]
+
+    def iter_records(self):
+        """Yield every record with its topic and difficulty, grouped by key"""
+        for key, entry in self.index.items():
+            start, count = entry[:2]
+            topic, question_type, difficulty = key.split(KEY_SEP)
+            if len(entry) > 2:
+                # Original spelling; banks built before it was stored only have the key
+                topic, difficulty = entry[2], entry[3]
+            for position in range(start, start + count):
+                record = self.get(position)
+                record['topic'] = topic
+                record['difficulty'] = difficulty
+                yield record
+
+
+class BankQuestionSource:
+    def __init__(self, bank, seed=None):
+        """
+        Drop-in replacement for QuestionGenerator backed by a QuestionBank
+        Questions are drawn without replacement per key, so one quiz never
+        repeats a question; call reset() to start a fresh draw
+        """
+        self.bank = bank
+        self.rng = random.Random(seed)
+        self._drawn = {}
+
+    def reset(self):
+        self._drawn = {}
+
+    def _draw(self, topic, question_type, difficulty):
+        positions = self.bank.positions(topic, question_type, difficulty)
+        drawn = self._drawn.setdefault(bank_key(topic, question_type, difficulty), set())
+        if len(drawn) >= len(positions):
+            raise RuntimeError(f"Question bank has no more {difficulty} {question_type} questions about {topic}")
+        # Rejection sampling stays O(1) per draw while the quiz is small
+        # compared to the number of stored questions for the key
+        while True:
+            position = positions[self.rng.randrange(len(positions))]
+            if position not in drawn:
+                drawn.add(position)
+                return self.bank.get(position)
+
+    def generate_mcq(self, topic, difficulty='medium', deadline=None, cancel_event=None, **kwargs):
+        check_cancelled(deadline, cancel_event)
+        record = self._draw(topic, 'MCQ', difficulty)
+        return MCQQuestion(question=record['question'], options=record['options'],
+                           correct_answer=record['correct_answer'])
+
+    def generate_fill_blank(self, topic, difficulty='medium', deadline=None, cancel_event=None, **kwargs):
+        check_cancelled(deadline, cancel_event)
+        record = self._draw(topic, 'Fill in the Blank', difficulty)
+        return FillBlankQuestion(question=record['question'], answer=record['correct_answer'])
+
+
+# One shared, read-only mapping per bank file for the whole process
+_banks = {}
+_banks_lock = threading.Lock()
+
+
+def get_bank(path=None):
+    """Return the shared QuestionBank for path (QUESTION_BANK_PATH by default), or None if missing"""
+    path = path or os.getenv('QUESTION_BANK_PATH', 'question_bank.qbank')
+    with _banks_lock:
+        if path not in _banks:
+            if not os.path.exists(path):
+                return None
+            _banks[path] = QuestionBank(path)
+        return _banks[path]
+
+
+def import_jsonl(jsonl_path, bank_path, dedup=False):
+    """Build a bank from a JSONL file of question dicts; unparseable lines count as skipped"""
+    malformed = 0
+
+    def records():
+        nonlocal malformed
+        with open(jsonl_path, encoding='utf-8') as f:
+            for line in f:
+                line = line.strip()
+                if not line:
+                    continue
+                try:
+                    yield json.loads(line)
+                except json.JSONDecodeError:
+                    malformed += 1
+    written, skipped = build_bank(records(), bank_path, dedup=dedup)
+    return written, skipped + malformed
+
+
+def export_jsonl(bank_path, jsonl_path):
+    """Write every question in a bank back out as JSONL"""
+    written = 0
+    with QuestionBank(bank_path) as bank, open(jsonl_path, 'w', encoding='utf-8') as f:
+        for record in bank.iter_records():
+            f.write(json.dumps(record, ensure_ascii=False) + '\n')
+            written += 1
+    return written
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build, export and inspect offline question banks")
+    sub = parser.add_subparsers(dest='command', required=True)
+    p = sub.add_parser('import', help="Build a bank from JSONL")
+    p.add_argument('jsonl')
+    p.add_argument('bank')
+    p.add_argument('--dedup', action='store_true', help="Skip near-duplicate questions")
+    p = sub.add_parser('export', help="Export a bank to JSONL")
+    p.add_argument('bank')
+    p.add_argument('jsonl')
+    p = sub.add_parser('info', help="Show the keys stored in a bank")
+    p.add_argument('bank')
+    args = parser.parse_args(argv)
+
+    if args.command == 'import':
+        written, skipped = import_jsonl(args.jsonl, args.bank, dedup=args.dedup)
+        print(f"Wrote {written} questions to {args.bank} ({skipped} invalid or duplicate lines skipped)")
+    elif args.command == 'export':
+        written = export_jsonl(args.bank, args.jsonl)
+        print(f"Exported {written} questions to {args.jsonl}")
+    else:
+        with QuestionBank(args.bank) as bank:
+            print(f"{len(bank)} questions")
+            for topic, question_type, difficulty in sorted(bank.keys()):
+                print(f"  {topic} | {question_type} | {difficulty}: {bank.count(topic, question_type, difficulty)}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,195 @@
+# Speculative over-generation
+# Starts num_questions + k single-attempt generations at once, keeps the first
+# num_questions that pass validation and cancels the rest, so one question that
+# needs three retries no longer sets the latency of the whole quiz
+import math
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from utils import GenerationCancelled, LLMCallError
+
+
+class FailureRateTracker:
+    def __init__(self, prior=0.2, alpha=0.1, max_spare_ratio=1.0):
+        """
+        Running per-attempt failure rate for each (topic, type, difficulty)
+        - prior: failure rate assumed before anything is observed
+        - alpha: weight of each new observation in the moving average
+        - max_spare_ratio: upper bound on spares as a fraction of the quiz size
+        """
+        self.prior = prior
+        self.alpha = alpha
+        self.max_spare_ratio = max_spare_ratio
+        self._rates = {}
+        self._lock = threading.Lock()
+        # Cumulative counters for tuning the cost / p99 trade-off
+        self.totals = {'launched': 0, 'accepted': 0, 'failed': 0, 'cancelled': 0, 'surplus': 0}
+
+    @staticmethod
+    def _key(topic, question_type, difficulty):
+        return (topic.strip().lower(), question_type, difficulty.lower())
+
+    def failure_rate(self, topic, question_type, difficulty):
+        with self._lock:
+            return self._rates.get(self._key(topic, question_type, difficulty), self.prior)
+
+    def record(self, topic, question_type, difficulty, failed):
+        key = self._key(topic, question_type, difficulty)
+        with self._lock:
+            rate = self._rates.get(key, self.prior)
+            self._rates[key] = rate + self.alpha * ((1.0 if failed else 0.0) - rate)
+
+    def spares(self, topic, question_type, difficulty, num_questions):
+        """
+        Number of extra generations to start for a quiz of num_questions
+        Enough to cover the expected failures plus roughly two standard
+        deviations, so most quizzes finish without a second round
+        """
+        p = min(self.failure_rate(topic, question_type, difficulty), 0.9)
+        expected = num_questions * p / (1 - p)
+        spread = 2 * math.sqrt(num_questions * p) / (1 - p)
+        k = math.ceil(expected + spread)
+        return max(1, min(k, math.ceil(num_questions * self.max_spare_ratio)))
+
+    def add_totals(self, report):
+        with self._lock:
+            for name in self.totals:
+                self.totals[name] += report[name]
+
+
+_tracker = FailureRateTracker()
+
+
+def get_failure_tracker():
+    """Process-wide failure rate tracker shared by all sessions"""
+    return _tracker
+
+
+def generate_speculatively(generator, question_type, topic, difficulty, num_questions,
+                           deadline=None, cancel_event=None, tracker=None, max_workers=16,
+                           accept=None, subtopics=None, on_question=None):
+    """
+    Generate num_questions questions by racing num_questions + k attempts
+    - generator: QuestionGenerator (or any object with the same methods)
+    - deadline: absolute time.monotonic() value, cancel_event: threading.Event
+    - tracker: FailureRateTracker used to size k (shared one by default)
+    - accept: optional check run on each valid question (e.g. duplicate
+      detection); rejected questions are replaced like failed attempts
+    - subtopics: optional plan; attempt i is focused on subtopics[i % len]
+    - on_question: called with each question as soon as it is accepted
+    Failed attempts are replaced only when the remaining work can no longer
+    fill the quiz. Returns (questions, report); report counts the spare work
+    that was cancelled or thrown away.
+    """
+    tracker = tracker or get_failure_tracker()
+    spares = tracker.spares(topic, question_type, difficulty, num_questions)
+    # Hard cap on total attempts, matching the old worst case of 3 per question
+    max_launches = num_questions * 3
+    stop = threading.Event()
+    if question_type == "Multiple Choice":
+        generate = generator.generate_mcq
+    else:
+        generate = generator.generate_fill_blank
+
+    def attempt(subtopic):
+        return generate(topic, difficulty.lower(), deadline=deadline, cancel_event=stop,
+                        max_attempts=1, subtopic=subtopic)
+
+    accepted = []
+    errors = []
+    report = {'spares': spares, 'launched': 0, 'accepted': 0, 'failed': 0, 'llm_errors': 0,
+              'duplicates': 0, 'cancelled': 0, 'surplus': 0, 'reason': None}
+    started = time.monotonic()
+    executor = ThreadPoolExecutor(max_workers=max(1, min(max_workers, num_questions + spares)))
+    pending = set()
+
+    def launch():
+        subtopic = subtopics[report['launched'] % len(subtopics)] if subtopics else None
+        pending.add(executor.submit(attempt, subtopic))
+        report['launched'] += 1
+
+    try:
+        for _ in range(min(num_questions + spares, max_launches)):
+            launch()
+        while pending and len(accepted) < num_questions:
+            if cancel_event is not None and cancel_event.is_set():
+                report['reason'] = 'cancelled'
+                break
+            if deadline is not None and time.monotonic() >= deadline:
+                report['reason'] = 'deadline'
+                break
+            done, pending = wait(pending, timeout=0.1, return_when=FIRST_COMPLETED)
+            for future in done:
+                try:
+                    question = future.result()
+                except GenerationCancelled as e:
+                    report['reason'] = e.reason
+                    report['cancelled'] += 1
+                    continue
+                except Exception as e:
+                    report['failed'] += 1
+                    errors.append(str(e))
+                    if isinstance(e, LLMCallError):
+                        # Transport trouble says nothing about how often the
+                        # model's answers fail validation, so keep it out of k
+                        report['llm_errors'] += 1
+                    else:
+                        tracker.record(topic, question_type, difficulty, failed=True)
+                    # Only start a replacement if what is left cannot fill the quiz
+                    if len(accepted) + len(pending) < num_questions and report['launched'] < max_launches:
+                        launch()
+                    continue
+                tracker.record(topic, question_type, difficulty, failed=False)
+                if len(accepted) >= num_questions:
+                    report['surplus'] += 1
+                elif accept is None or accept(question):
+                    accepted.append(question)
+                    if on_question is not None:
+                        on_question(question)
+                else:
+                    report['duplicates'] += 1
+                    if len(accepted) + len(pending) < num_questions and report['launched'] < max_launches:
+                        launch()
+    finally:
+        # Stop whatever is still queued or in flight
+        stop.set()
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+
+    for future in pending:
+        if future.cancelled():
+            report['cancelled'] += 1
+            continue
+        try:
+            question = future.result()
+        except GenerationCancelled:
+            report['cancelled'] += 1
+            continue
+        except LLMCallError:
+            report['failed'] += 1
+            report['llm_errors'] += 1
+            continue
+        except Exception:
+            report['failed'] += 1
+            continue
+        # Finished before the stop landed - keep it if the quiz still has room
+        if len(accepted) >= num_questions:
+            report['surplus'] += 1
+        elif accept is None or accept(question):
+            accepted.append(question)
+            if on_question is not None:
+                on_question(question)
+        else:
+            report['duplicates'] += 1
+
+    report['accepted'] = len(accepted)
+    if len(accepted) >= num_questions:
+        report['reason'] = None
+    elif report['reason'] is None and errors:
+        report['reason'] = 'errors'
+    report['errors'] = errors
+    report['seconds'] = round(time.monotonic() - started, 3)
+    report['failure_rate'] = round(tracker.failure_rate(topic, question_type, difficulty), 3)
+    tracker.add_totals(report)
+    return accepted, report
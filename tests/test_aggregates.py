@@ -0,0 +1,46 @@
+import utils
+from aggregates import ScoreAggregates
+
+RESULTS = [
+    {'question_number': 1, 'question': "What is the default port of SSH?", 'is_correct': True},
+    {'question_number': 2, 'question': "What is the default port of FTP?", 'is_correct': False},
+]
+
+
+def _manager():
+    manager = utils.QuizManager()
+    manager.current_topic = "Computer Networks"
+    manager.results = list(RESULTS)
+    return manager
+
+
+def test_saving_twice_records_one_attempt(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    aggregates = ScoreAggregates(str(tmp_path / 'aggregates.db'))
+    monkeypatch.setattr(utils, 'get_aggregates', lambda: aggregates)
+    manager = _manager()
+    assert manager.save_to_csv("ana")
+    assert manager.save_to_csv("ana")
+    summary = aggregates.topic_summary()
+    assert summary[0]['attempts'] == 1
+    assert aggregates.leaderboard("Computer Networks")[0]['attempts'] == 1
+
+
+def test_aggregate_failure_still_saves_and_retries(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    aggregates = ScoreAggregates(str(tmp_path / 'aggregates.db'))
+
+    class Broken:
+        def record(self, *args):
+            raise RuntimeError("database is locked")
+
+    monkeypatch.setattr(utils, 'get_aggregates', lambda: Broken())
+    manager = _manager()
+    path = manager.save_to_csv()
+    # The CSV was written even though the dashboard update failed
+    assert path and (tmp_path / path).exists()
+    assert not manager.results_recorded
+
+    monkeypatch.setattr(utils, 'get_aggregates', lambda: aggregates)
+    assert manager.save_to_csv()
+    assert aggregates.topic_summary()[0]['attempts'] == 1
@@ -0,0 +1,52 @@
+from dedup import NearDuplicateIndex, question_text
+
+
+def _text(question, answer):
+    return question_text({'question': question, 'correct_answer': answer})
+
+
+TEMPLATED = [
+    ("What is the default port of HTTP?", "80"),
+    ("What is the default port of HTTPS?", "443"),
+    ("What is the default port of SSH?", "22"),
+    ("What is the default port of FTP?", "21"),
+    ("What is the default port of SMTP?", "25"),
+    ("What is the capital of France?", "Paris"),
+    ("What is the capital of Spain?", "Madrid"),
+    ("What is the capital of Italy?", "Rome"),
+    ("What is the capital of Germany?", "Berlin"),
+    ("The default port of HTTP is _____.", "80"),
+    ("The default port of SSH is _____.", "22"),
+]
+
+
+def test_templated_questions_with_different_answers_stay_distinct():
+    index = NearDuplicateIndex()
+    duplicates = [question for question, answer in TEMPLATED
+                  if index.check_and_add(_text(question, answer))]
+    assert duplicates == []
+    assert len(index) == len(TEMPLATED)
+
+
+def test_rewording_with_the_same_answer_is_a_duplicate():
+    index = NearDuplicateIndex()
+    for question, answer in TEMPLATED:
+        index.add(_text(question, answer))
+    assert index.check_and_add(_text("What is the default port for SSH?", "22"))
+    assert index.check_and_add(_text("Which city is the capital of France?", "paris"))
+    assert not index.check_and_add(_text("Which city is the capital of France?", "Lyon"))
+
+
+def test_plain_text_compares_whole_text():
+    index = NearDuplicateIndex()
+    assert not index.check_and_add("the quick brown fox jumps over the lazy dog")
+    assert index.check_and_add("The quick brown fox jumps over the lazy dog again!")
+    assert not index.check_and_add("an entirely different sentence about databases")
+
+
+def test_index_keeps_matching_after_growing():
+    index = NearDuplicateIndex()
+    for i in range(300):
+        index.add(_text(f"Question number {i} about topic {i * 7}?", str(i)))
+    assert index.check_and_add(_text("Question number 5 about topic 35?", "5"))
+    assert not index.check_and_add(_text("Question number 5 about topic 35?", "6"))
@@ -0,0 +1,54 @@
+import time
+import jobs
+from jobs import JobQueue, PENDING, CANCELLED, FAILED
+
+
+def _age_heartbeat(queue, job_id, seconds):
+    with queue._connect() as conn:
+        conn.execute("UPDATE jobs SET heartbeat_at = ? WHERE id = ?", (time.time() - seconds, job_id))
+
+
+def test_running_worker_requeues_stale_jobs(tmp_path, monkeypatch):
+    db = str(tmp_path / 'jobs.db')
+    queue = JobQueue(db)
+    job_id = queue.submit("DBMS", "Multiple Choice", "Medium", 2)
+    dead = queue.claim('dead-worker')
+    queue.add_question(job_id, 0, {'question': 'partial'})
+    cancelling_id = queue.submit("DBMS", "Multiple Choice", "Medium", 2)
+    queue.claim('dead-worker')
+    queue.cancel(cancelling_id)
+    _age_heartbeat(queue, job_id, jobs.STALE_AFTER + 1)
+    _age_heartbeat(queue, cancelling_id, jobs.STALE_AFTER + 1)
+
+    # A worker that is already running picks the job up on its periodic sweep
+    claimed = []
+    monkeypatch.setattr(jobs, 'run_job', lambda q, job, generator: claimed.append(job['id']))
+    monkeypatch.setattr('utils.QuestionGenerator', lambda session_id: None)
+    jobs.worker_loop(db, poll_interval=0.01, max_jobs=1)
+
+    assert dead['worker'] == 'dead-worker'
+    assert claimed == [job_id]
+    assert queue.questions(job_id) == []
+    assert queue.get(cancelling_id)['status'] == CANCELLED
+
+
+def test_fresh_jobs_are_left_alone(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    job_id = queue.submit("DBMS", "Multiple Choice", "Medium", 2)
+    queue.claim('worker')
+    assert queue.requeue_stale() == 0
+    assert not queue.fail_stale(job_id)
+    assert queue.get(job_id)['status'] != PENDING
+
+
+def test_fail_stale_marks_abandoned_job_failed(tmp_path):
+    queue = JobQueue(str(tmp_path / 'jobs.db'))
+    job_id = queue.submit("DBMS", "Multiple Choice", "Medium", 2)
+    queue.claim('worker')
+    _age_heartbeat(queue, job_id, 2 * jobs.STALE_AFTER + 1)
+    assert queue.fail_stale(job_id)
+    job = queue.get(job_id)
+    assert job['status'] == FAILED
+    assert job['error']
+    # Already finished, so a second poll changes nothing
+    assert not queue.fail_stale(job_id)
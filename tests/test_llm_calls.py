@@ -0,0 +1,74 @@
+import json
+import time
+import asyncio
+import threading
+import types
+import pytest
+import utils
+from llm_scheduler import LLMScheduler
+
+MCQ_JSON = json.dumps({"question": "Which protocol is used between autonomous systems?",
+                       "options": ["BGP", "ARP", "DHCP", "SMTP"], "correct_answer": "BGP"})
+
+
+class LoopBoundLLM:
+    # Behaves like ChatGroq's pooled async HTTP client: connections belong to
+    # the event loop of the first request, and any other loop fails
+    def __init__(self, delay=0.01):
+        self.delay = delay
+        self.loop = None
+        self.requests = 0
+
+    async def ainvoke(self, prompt_text):
+        self.requests += 1
+        loop = asyncio.get_running_loop()
+        if self.loop is None:
+            self.loop = loop
+        elif loop is not self.loop:
+            raise ConnectionError("Connection error.")
+        await asyncio.sleep(self.delay)
+        return types.SimpleNamespace(content=MCQ_JSON, usage_metadata={'input_tokens': 10, 'output_tokens': 20})
+
+
+def make_generator(llm):
+    generator = utils.QuestionGenerator(scheduler=LLMScheduler(max_concurrency=8, requests_per_minute=0))
+    generator.llm = llm
+    return generator
+
+
+def test_consecutive_calls_with_deadline_reuse_one_loop():
+    llm = LoopBoundLLM()
+    generator = make_generator(llm)
+    for _ in range(5):
+        generator.generate_mcq("networks", deadline=time.monotonic() + 10, max_attempts=3)
+    assert generator.calls == 5
+    assert llm.requests == 5
+
+
+def test_calls_from_several_threads_share_the_loop():
+    llm = LoopBoundLLM()
+    generator = make_generator(llm)
+    cancel_event = threading.Event()
+    errors = []
+
+    def work():
+        try:
+            generator.generate_mcq("networks", cancel_event=cancel_event, max_attempts=1)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=work) for _ in range(6)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert generator.calls == 6
+
+
+def test_deadline_cancels_request_in_flight():
+    generator = make_generator(LoopBoundLLM(delay=5))
+    started = time.monotonic()
+    with pytest.raises(utils.GenerationCancelled):
+        generator.generate_mcq("networks", deadline=time.monotonic() + 0.2)
+    assert time.monotonic() - started < 2
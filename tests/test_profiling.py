@@ -0,0 +1,24 @@
+import json
+import time
+from profiling import RerunProfiler, start_rerun_profile, STATE_KEY
+
+
+def test_interrupted_run_excludes_idle_time(tmp_path):
+    state = {}
+    profiler = start_rerun_profile(True, label='first', state=state)
+    profiler.out_dir = str(tmp_path)
+    with profiler.phase('work'):
+        time.sleep(0.05)
+    # The run stops here without finish(); the user idles before the next one
+    time.sleep(0.3)
+    next_profiler = start_rerun_profile(True, label='second', state=state)
+    # The leftover hook was removed, so the new profiler could start
+    assert next_profiler._profile is not None
+    next_profiler.out_dir = str(tmp_path)
+    next_profiler.finish()
+
+    summary = json.loads((tmp_path / 'summary.json').read_text(encoding='utf-8'))
+    interrupted = [entry for entry in summary if entry['interrupted']]
+    assert len(interrupted) == 1
+    assert 0.05 <= interrupted[0]['total_seconds'] < 0.25
+    assert state[STATE_KEY] is next_profiler
@@ -0,0 +1,47 @@
+import os
+import json
+import pytest
+from question_bank import QuestionBank, import_jsonl, export_jsonl
+
+VALID = {'type': 'MCQ', 'question': 'Which is a DBMS?', 'options': ['MySQL', 'Vim', 'Linux', 'Chrome'],
+         'correct_answer': 'MySQL', 'topic': 'DBMS', 'difficulty': 'Medium'}
+
+
+def write_jsonl(path, lines):
+    with open(path, 'w', encoding='utf-8') as f:
+        for line in lines:
+            f.write((line if isinstance(line, str) else json.dumps(line)) + '\n')
+
+
+def import_lines(tmp_path, lines):
+    source = tmp_path / 'questions.jsonl'
+    bank = tmp_path / 'bank.qbank'
+    write_jsonl(source, lines)
+    result = import_jsonl(str(source), str(bank))
+    assert not os.path.exists(str(bank) + '.tmp')
+    return result, bank
+
+
+@pytest.mark.parametrize('bad_line', [
+    '{not json',
+    [1, 2],
+    '"just a string"',
+    dict(VALID, options=[f'option {i}' for i in range(300)], correct_answer='option 0'),
+    dict(VALID, topic=None),
+    dict(VALID, topic='   '),
+    dict(VALID, options='MySQL'),
+    dict(VALID, question=None),
+])
+def test_bad_records_are_skipped_and_counted(tmp_path, bad_line):
+    (written, skipped), bank = import_lines(tmp_path, [VALID, bad_line, VALID])
+    assert (written, skipped) == (2, 1)
+    with QuestionBank(str(bank)) as opened:
+        assert opened.count('dbms', 'MCQ', 'medium') == 2
+
+
+def test_export_keeps_original_topic_and_difficulty(tmp_path):
+    _, bank = import_lines(tmp_path, [VALID])
+    out = tmp_path / 'out.jsonl'
+    export_jsonl(str(bank), str(out))
+    record = json.loads(out.read_text(encoding='utf-8'))
+    assert (record['topic'], record['difficulty']) == ('DBMS', 'Medium')
@@ -0,0 +1,52 @@
+import itertools
+import threading
+import pytest
+import utils
+from utils import MCQQuestion, LLMCallError
+from llm_scheduler import LLMScheduler
+from speculative import FailureRateTracker, generate_speculatively
+
+
+class FlakyGenerator:
+    # Every other attempt fails in transport; the rest validate
+    def __init__(self, invalid=False):
+        self.invalid = invalid
+        self.counter = itertools.count()
+        self.lock = threading.Lock()
+
+    def generate_mcq(self, topic, difficulty, deadline=None, cancel_event=None, max_attempts=1, subtopic=None):
+        with self.lock:
+            n = next(self.counter)
+        if n % 2:
+            if self.invalid:
+                raise RuntimeError("Correct answer not in options")
+            raise LLMCallError("LLM request failed: Connection error.")
+        return MCQQuestion(question=f"Question {n}?", options=['a', 'b', 'c', 'd'], correct_answer='a')
+
+
+def test_transport_errors_do_not_raise_failure_rate():
+    tracker = FailureRateTracker(prior=0.2)
+    questions, report = generate_speculatively(FlakyGenerator(), "Multiple Choice", "networks", "easy", 5,
+                                               tracker=tracker, max_workers=1)
+    assert len(questions) == 5
+    assert report['llm_errors'] == report['failed'] > 0
+    assert tracker.failure_rate("networks", "Multiple Choice", "easy") < 0.2
+
+
+def test_validation_errors_still_raise_failure_rate():
+    tracker = FailureRateTracker(prior=0.2)
+    generate_speculatively(FlakyGenerator(invalid=True), "Multiple Choice", "networks", "easy", 5,
+                           tracker=tracker, max_workers=1)
+    assert tracker.failure_rate("networks", "Multiple Choice", "easy") > 0.2
+
+
+class BrokenLLM:
+    def invoke(self, prompt_text):
+        raise ConnectionError("Connection error.")
+
+
+def test_generator_reports_transport_failure_as_llm_call_error():
+    generator = utils.QuestionGenerator(scheduler=LLMScheduler(max_concurrency=1, requests_per_minute=0))
+    generator.llm = BrokenLLM()
+    with pytest.raises(LLMCallError):
+        generator.generate_mcq("networks", max_attempts=2)
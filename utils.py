@@ -1,17 +1,207 @@
 # Import required libraries
 import os
+import time
+import asyncio
+import threading
+from concurrent.futures import TimeoutError as FutureTimeout
 import streamlit as st  
 import pandas as pd    
-from typing import List
+from typing import List, Optional
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
-from langchain.prompts import PromptTemplate
-from langchain.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field, validator
+from llm_scheduler import Priority, SchedulerTimeout, get_scheduler
+from dedup import NearDuplicateIndex, question_text
+from aggregates import get_aggregates
+from variants import variant_report
+from prompts import get_prompt
 
 # Load environment variables from .env file
 load_dotenv()
 
+# Raised when a generation is stopped by its deadline or cancel signal
+class GenerationCancelled(RuntimeError):
+    def __init__(self, reason):
+        # reason is either 'deadline' or 'cancelled'
+        self.reason = reason
+        super().__init__(f"Generation stopped: {reason}")
+
+class LLMCallError(RuntimeError):
+    # The request itself failed (network, provider, rate limit), as opposed
+    # to the model answering with something that does not validate
+    pass
+
+class DuplicatesExhausted(RuntimeError):
+    # A slot used up its retries on near-duplicates; not a validation error
+    pass
+
+# One event loop per process for cancellable LLM calls. ChatGroq keeps a
+# single async HTTP client whose connections belong to the loop they were
+# opened on, so a fresh loop per call (asyncio.run) breaks every other request
+_llm_loop = None
+_llm_loop_pid = None
+_llm_loop_lock = threading.Lock()
+
+def get_llm_loop():
+    """Shared event loop running on a daemon thread (recreated after a fork)"""
+    global _llm_loop, _llm_loop_pid
+    with _llm_loop_lock:
+        if _llm_loop is None or _llm_loop_pid != os.getpid():
+            _llm_loop = asyncio.new_event_loop()
+            _llm_loop_pid = os.getpid()
+            threading.Thread(target=_llm_loop.run_forever, name="llm-event-loop", daemon=True).start()
+        return _llm_loop
+
+def check_cancelled(deadline=None, cancel_event=None):
+    """Raise GenerationCancelled if the cancel signal is set or the deadline has passed"""
+    if cancel_event is not None and cancel_event.is_set():
+        raise GenerationCancelled('cancelled')
+    if deadline is not None and time.monotonic() >= deadline:
+        raise GenerationCancelled('deadline')
+
+def question_to_dict(question, question_type):
+    """Convert a generated MCQQuestion / FillBlankQuestion to the quiz question structure"""
+    if question_type == "Multiple Choice":
+        return {
+            'type': 'MCQ',
+            'question': question.question,
+            'options': question.options,
+            'correct_answer': question.correct_answer
+        }
+    return {
+        'type': 'Fill in the Blank',
+        'question': question.question,
+        'correct_answer': question.answer
+    }
+
+def shortfall_report(requested, generated, reason=None, errors=None):
+    """Summarise how far a (possibly partial) quiz fell short of the request"""
+    errors = errors or []
+    return {
+        'requested': requested,
+        'generated': generated,
+        'missing': max(0, requested - generated),
+        'reason': reason or ('errors' if errors and generated < requested else None),
+        'errors': errors,
+    }
+
+def generate_question_set(generator, topic, question_type, difficulty, num_questions,
+                          deadline=None, cancel_event=None, speculative=False,
+                          dedup_index=None, on_question=None, max_duplicate_retries=2,
+                          plan=False):
+    """
+    Generate num_questions validated, non-duplicate questions
+    - deadline: overall time budget in seconds (None for no limit)
+    - cancel_event: threading.Event that stops generation when set
+    - speculative: race extra single-attempt generations instead of retrying
+    - plan: split the topic into subtopics first (one cheap LLM call, cached)
+      and generate each question in parallel against its own subtopic
+    - dedup_index: NearDuplicateIndex to check against (a fresh one per call
+      by default, so only repeats within this quiz are rejected)
+    - on_question: called with each accepted question as soon as it is ready
+    Near-duplicates are dropped and only that slot is regenerated.
+    Returns (questions, shortfall, speculation report or None)
+    """
+    deadline_at = time.monotonic() + deadline if deadline else None
+    if dedup_index is None:
+        dedup_index = NearDuplicateIndex()
+    dedup_lock = threading.Lock()
+
+    def accept(question):
+        with dedup_lock:
+            return not dedup_index.check_and_add(question_text(question))
+
+    calls_before = getattr(generator, 'calls', 0)
+    subtopics = []
+    if plan and hasattr(generator, 'plan_subtopics'):
+        try:
+            subtopics = generator.plan_subtopics(topic, difficulty, num_questions,
+                                                 deadline=deadline_at, cancel_event=cancel_event)
+        except GenerationCancelled:
+            subtopics = []
+
+    questions = []
+    speculation = None
+    stop_reason = None
+    errors = []
+    duplicates = 0
+    if speculative:
+        from speculative import generate_speculatively
+        questions, speculation = generate_speculatively(
+            generator, question_type, topic, difficulty, num_questions,
+            deadline=deadline_at, cancel_event=cancel_event, accept=accept,
+            subtopics=subtopics, on_question=on_question
+        )
+        stop_reason = speculation['reason']
+        errors = speculation['errors']
+        duplicates = speculation['duplicates']
+    else:
+        if question_type == "Multiple Choice":
+            generate = generator.generate_mcq
+        else:
+            generate = generator.generate_fill_blank
+        rejected = []
+
+        def generate_slot(subtopic):
+            # Retry only this slot while the model keeps repeating itself
+            for _ in range(max_duplicate_retries + 1):
+                question = generate(topic, difficulty.lower(), deadline=deadline_at,
+                                    cancel_event=cancel_event, subtopic=subtopic)
+                if accept(question):
+                    return question
+                rejected.append(question)
+            raise DuplicatesExhausted("Only near-duplicate questions were generated")
+
+        slots = [subtopics[i % len(subtopics)] if subtopics else None for i in range(num_questions)]
+        if subtopics:
+            # Each slot has its own subtopic, so they can all run at once
+            from concurrent.futures import ThreadPoolExecutor, as_completed
+            results = {}
+            with ThreadPoolExecutor(max_workers=min(num_questions, 16)) as executor:
+                futures = {executor.submit(generate_slot, subtopic): i for i, subtopic in enumerate(slots)}
+                for future in as_completed(futures):
+                    try:
+                        question = future.result()
+                    except GenerationCancelled as e:
+                        stop_reason = e.reason
+                        continue
+                    except DuplicatesExhausted:
+                        continue
+                    except Exception as e:
+                        errors.append(str(e))
+                        continue
+                    results[futures[future]] = question
+                    if on_question is not None:
+                        on_question(question)
+            questions = [results[i] for i in sorted(results)]
+        else:
+            for subtopic in slots:
+                try:
+                    question = generate_slot(subtopic)
+                except GenerationCancelled as e:
+                    stop_reason = e.reason
+                    break
+                except DuplicatesExhausted:
+                    # Counted in duplicates; reported as the shortfall reason below
+                    continue
+                except Exception as e:
+                    # Keep what we already have and move on to the next question
+                    errors.append(str(e))
+                    continue
+                questions.append(question)
+                if on_question is not None:
+                    on_question(question)
+        duplicates = len(rejected)
+
+    shortfall = shortfall_report(num_questions, len(questions), stop_reason, errors)
+    shortfall['duplicates'] = duplicates
+    # Accepted-question rate: unique, valid questions per LLM call
+    shortfall['llm_calls'] = getattr(generator, 'calls', 0) - calls_before
+    shortfall['accepted_rate'] = len(questions) / shortfall['llm_calls'] if shortfall['llm_calls'] else None
+    if shortfall['missing'] and not shortfall['reason'] and duplicates:
+        shortfall['reason'] = 'duplicates'
+    return questions, shortfall, speculation
+
 # Define data model for Multiple Choice Questions using Pydantic
 class MCQQuestion(BaseModel):
     # Define the structure of an MCQ with field descriptions
@@ -41,6 +231,14 @@ class FillBlankQuestion(BaseModel):
             return v.get('description', str(v))
         return str(v)
     
+# Define data model for a subtopic plan used to spread questions over a topic
+class SubtopicPlan(BaseModel):
+    subtopics: List[str] = Field(description="Distinct, specific subtopics of the topic")
+
+# Subtopic plans are cached per (topic, difficulty) for the whole process
+_subtopic_cache = {}
+_subtopic_lock = threading.Lock()
+
 # Improved QuizManager 
 
 class QuizManager:
@@ -48,15 +246,24 @@ class QuizManager:
         self.questions = []
         self.user_answers = []
         self.results = []
+        # The score aggregates take each evaluated result once, however
+        # often it is saved
+        self.results_recorded = False
         self.current_topic = None
         self.current_difficulty = None
         self.current_quiz_id = None  
+        self.shortfall = None
+        self.speculation = None
+        self.variants = None
 
     def reset_state(self):
         """Reset all quiz state when starting a new quiz"""
         self.questions = []
         self.user_answers = []
         self.results = []
+        self.shortfall = None
+        self.speculation = None
+        self.variants = None
 
         
     def generate_quiz_id(self, topic, question_type, difficulty):
@@ -67,8 +274,22 @@ class QuizManager:
         quiz_str = f"{topic}_{question_type}_{difficulty}_{timestamp}"
         return hashlib.md5(quiz_str.encode()).hexdigest()[:8]
 
-    def generate_questions(self, generator, topic, question_type, difficulty, num_questions):
-        """Generate a new set of questions with complete state reset"""
+    def _add_question(self, question, question_type, topic):
+        """Store a generated question in the quiz structure"""
+        record = question_to_dict(question, question_type)
+        record['topic'] = topic  # Store topic explicitly
+        record['quiz_id'] = self.current_quiz_id  # Store quiz session ID
+        self.questions.append(record)
+
+    def generate_questions(self, generator, topic, question_type, difficulty, num_questions,
+                           deadline=None, cancel_event=None, speculative=False, dedup_index=None,
+                           plan=False):
+        """
+        Generate a new set of questions with complete state reset
+        Arguments after num_questions are passed to generate_question_set.
+        Questions validated before a failure, deadline or cancel are kept as a
+        partial quiz; self.shortfall describes what is missing and why
+        """
         # Reset state completely for new quiz
         self.reset_state()
         
@@ -77,34 +298,25 @@ class QuizManager:
         self.current_difficulty = difficulty
         self.current_quiz_id = self.generate_quiz_id(topic, question_type, difficulty)
         
-        try:
-            for _ in range(num_questions):
-                if question_type == "Multiple Choice":
-                    question = generator.generate_mcq(topic, difficulty.lower())
-                    self.questions.append({
-                        'type': 'MCQ',
-                        'question': question.question,
-                        'options': question.options,
-                        'correct_answer': question.correct_answer,
-                        'topic': topic,  # Store topic explicitly
-                        'quiz_id': self.current_quiz_id  # Store quiz session ID
-                    })
-                else:
-                    question = generator.generate_fill_blank(topic, difficulty.lower())
-                    self.questions.append({
-                        'type': 'Fill in the Blank',
-                        'question': question.question,
-                        'correct_answer': question.answer,
-                        'topic': topic,  # Store topic explicitly
-                        'quiz_id': self.current_quiz_id  # Store quiz session ID
-                    })
-            
-            # Initialize user_answers list with placeholders
-            self.user_answers = [[] if q['type'] == 'MCQ' else "" for q in self.questions]
-            return True
-        except Exception as e:
-            st.error(f"Error generating questions: {e}")
+        generated, self.shortfall, self.speculation = generate_question_set(
+            generator, topic, question_type, difficulty, num_questions,
+            deadline=deadline, cancel_event=cancel_event, speculative=speculative,
+            dedup_index=dedup_index, plan=plan
+        )
+        for question in generated:
+            self._add_question(question, question_type, topic)
+        # How far each LLM call stretches once variants are derived from it
+        self.variants = variant_report(self.questions, self.shortfall['llm_calls'])
+        self.shortfall['stems_per_call'] = self.variants['stems_per_call']
+        self.shortfall['option_orders_per_call'] = self.variants['option_orders_per_call']
+        
+        # Initialize user_answers list with placeholders
+        self.user_answers = [[] if q['type'] == 'MCQ' else "" for q in self.questions]
+        if not self.questions:
+            errors = self.shortfall['errors']
+            st.error(f"Error generating questions: {errors[-1] if errors else self.shortfall['reason']}")
             return False
+        return True
 
     def attempt_quiz(self):
         """Display quiz questions for user to answer"""
@@ -161,6 +373,7 @@ class QuizManager:
     def evaluate_quiz(self):
         """Evaluate quiz answers and generate results"""
         self.results = []
+        self.results_recorded = False
         for i, (q, user_ans) in enumerate(zip(self.questions, self.user_answers)):
             if q['type'] == 'MCQ':
                 # For MCQ with checkboxes, we need to check if the correct answer is among the selected options
@@ -199,8 +412,8 @@ class QuizManager:
         """Convert results to a pandas DataFrame"""
         return pd.DataFrame(self.results)
 
-    def save_to_csv(self):
-        """Save quiz results to CSV file"""
+    def save_to_csv(self, candidate=None):
+        """Save quiz results to CSV file and fold them into the score aggregates"""
         try:
             if not self.results:
                 st.warning("No results to save.")
@@ -214,13 +427,21 @@ class QuizManager:
             os.makedirs('results', exist_ok=True)
             full_path = os.path.join('results', unique_filename)
             df.to_csv(full_path, index=False)
-            
-            st.success(f"Results saved successfully!")
-            return full_path
         except Exception as e:
             st.error(f"Failed to save results: {e}")
             return None
 
+        # Once per evaluated result; a failure here does not undo the saved
+        # CSV and is retried on the next save
+        if not self.results_recorded:
+            try:
+                get_aggregates().record(self.results, self.current_topic, candidate)
+                self.results_recorded = True
+            except Exception as e:
+                st.warning(f"Results saved, but the score dashboard could not be updated: {e}")
+        st.success(f"Results saved successfully!")
+        return full_path
+
     def clear_session_state(self):
         """Clear session state for this quiz session"""
         keys_to_remove = []
@@ -232,57 +453,153 @@ class QuizManager:
             del st.session_state[key]
 
 class QuestionGenerator:
-    def __init__(self):
+    def __init__(self, session_id="default", priority=Priority.INTERACTIVE, scheduler=None,
+                 prompt_variant=None):
         """
         Initialize question generator with Groq API
         Sets up the language model with specific parameters:
         - Uses llama-3.1-8b-instant model
         - Sets temperature to 0.9 for creative variety
+        All LLM calls go through the shared scheduler, queued under
+        session_id with the given priority class. prompt_variant picks the
+        prompt wording from prompts.py (MCQ_PROMPT_VARIANT by default)
         """
         self.llm = ChatGroq(
             api_key=os.getenv('GROQ_API_KEY'), 
             model="llama-3.1-8b-instant",
             temperature=0.9
         )
+        self.session_id = session_id
+        self.priority = priority
+        self.scheduler = scheduler or get_scheduler()
+        self.prompt_variant = prompt_variant
+        # Counters for the accepted-question rate and prompt size
+        self.calls = 0
+        self.accepted = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self._stats_lock = threading.Lock()
+
+    @property
+    def accepted_rate(self):
+        """Valid questions returned per LLM call made by this generator"""
+        return self.accepted / self.calls if self.calls else None
 
-    def generate_mcq(self, topic: str, difficulty: str = 'medium') -> MCQQuestion:
+    def _count(self, name, amount=1):
+        with self._stats_lock:
+            setattr(self, name, getattr(self, name) + amount)
+
+    def _invoke_until(self, prompt_text, deadline, cancel_event):
+        # Run the request as a task on the shared loop so it can be cancelled
+        # mid-flight, which closes the HTTP request instead of abandoning it
+        future = asyncio.run_coroutine_threadsafe(self.llm.ainvoke(prompt_text), get_llm_loop())
+        try:
+            while True:
+                check_cancelled(deadline, cancel_event)
+                timeout = 0.1
+                if deadline is not None:
+                    timeout = max(0.001, min(timeout, deadline - time.monotonic()))
+                try:
+                    return future.result(timeout=timeout)
+                except FutureTimeout:
+                    continue
+        except GenerationCancelled:
+            future.cancel()
+            raise
+
+    def _invoke(self, prompt_text, deadline=None, cancel_event=None):
+        """
+        Send one prompt to the LLM once the scheduler admits it
+        deadline (absolute time.monotonic() value) and cancel_event stop the
+        call both while queued and while the request is in flight
+        """
+        check_cancelled(deadline, cancel_event)
+        self._count('calls')
+        if deadline is None and cancel_event is None:
+            call = lambda: self.llm.invoke(prompt_text)
+        else:
+            call = lambda: self._invoke_until(prompt_text, deadline, cancel_event)
+        try:
+            response = self.scheduler.run(
+                call,
+                session_id=self.session_id,
+                priority=self.priority,
+                deadline=deadline,
+                cancel_event=cancel_event
+            )
+        except SchedulerTimeout:
+            check_cancelled(deadline, cancel_event)
+            raise GenerationCancelled('deadline')
+        except GenerationCancelled:
+            raise
+        except Exception as e:
+            raise LLMCallError(f"LLM request failed: {e}") from e
+        usage = getattr(response, 'usage_metadata', None) or {}
+        self._count('input_tokens', usage.get('input_tokens', 0))
+        self._count('output_tokens', usage.get('output_tokens', 0))
+        return response
+
+    def plan_subtopics(self, topic: str, difficulty: str = 'medium', count: int = 5,
+                       deadline=None, cancel_event=None) -> List[str]:
+        """
+        Split a topic into distinct subtopics with one LLM call
+        Plans are cached per topic and difficulty for the whole process and
+        only re-planned when a larger quiz needs more subtopics than cached.
+        Returns an empty list if planning fails, so callers fall back to the
+        bare topic.
+        """
+        key = (topic.strip().lower(), difficulty.strip().lower())
+        with _subtopic_lock:
+            cached = _subtopic_cache.get(key, [])
+        if len(cached) >= count:
+            return cached[:count]
+
+        prompt = get_prompt('subtopics', self.prompt_variant)
+        try:
+            response = self._invoke(prompt.format(count=count, topic=topic, difficulty=difficulty),
+                                    deadline, cancel_event)
+            plan = prompt.parse(response.content)
+        except GenerationCancelled:
+            raise
+        except Exception:
+            return cached[:count]
+
+        # Drop blanks and repeats while keeping the model's order
+        subtopics = []
+        seen = set()
+        for subtopic in plan.subtopics:
+            normalized = subtopic.strip().lower()
+            if normalized and normalized not in seen:
+                seen.add(normalized)
+                subtopics.append(subtopic.strip())
+        if len(subtopics) > len(cached):
+            with _subtopic_lock:
+                _subtopic_cache[key] = subtopics
+        return subtopics[:count]
+
+    def generate_mcq(self, topic: str, difficulty: str = 'medium', deadline=None, cancel_event=None, max_attempts=3,
+                     subtopic: Optional[str] = None) -> MCQQuestion:
         """
         Generate Multiple Choice Question with robust error handling
         Includes:
         - Output parsing using Pydantic
-        - Structured prompt template
+        - Shared, prebuilt prompt template (prompts.py)
         - Multiple retry attempts on failure
         - Validation of generated questions
+        - Deadline / cancel signal that stops in-flight calls without retrying
+        - Optional subtopic to focus the question on one facet of the topic
         """
-        # Set up Pydantic parser for type checking and validation
-        mcq_parser = PydanticOutputParser(pydantic_object=MCQQuestion)
-        
-        # Define the prompt template with specific format requirements
-        prompt = PromptTemplate(
-            template=(
-                "Generate a {difficulty} multiple-choice question about {topic}.\n\n"
-                "Return ONLY a JSON object with these exact fields:\n"
-                "- 'question': A clear, specific question\n"
-                "- 'options': An array of exactly 4 possible answers\n"
-                "- 'correct_answer': One of the options that is the correct answer\n\n"
-                "Example format:\n"
-                '{{\n'
-                '    "question": "What is the capital of France?",\n'
-                '    "options": ["London", "Berlin", "Paris", "Madrid"],\n'
-                '    "correct_answer": "Paris"\n'
-                '}}\n\n'
-                "Your response:"
-            ),
-            input_variables=["topic", "difficulty"]
-        )
+        # Template and parser are built once per process (see prompts.py)
+        prompt = get_prompt('mcq', self.prompt_variant)
+        focus = f" Focus specifically on: {subtopic}." if subtopic else ""
 
         # Implement retry logic with maximum attempts
-        max_attempts = 3
         for attempt in range(max_attempts):
             try:
                 # Generate response using LLM
-                response = self.llm.invoke(prompt.format(topic=topic, difficulty=difficulty))
-                parsed_response = mcq_parser.parse(response.content)
+                response = self._invoke(prompt.format(topic=topic, difficulty=difficulty, focus=focus),
+                                        deadline, cancel_event)
+                parsed_response = prompt.parse(response.content)
                 
                 # Validate the generated question meets requirements
                 if not parsed_response.question or len(parsed_response.options) != 4 or not parsed_response.correct_answer:
@@ -290,49 +607,42 @@ class QuestionGenerator:
                 if parsed_response.correct_answer not in parsed_response.options:
                     raise ValueError("Correct answer not in options")
                 
+                self._count('accepted')
                 return parsed_response
+            except GenerationCancelled:
+                # Deadline or cancel signal - never retry
+                raise
             except Exception as e:
                 # On final attempt, raise error; otherwise continue trying
                 if attempt == max_attempts - 1:
-                    raise RuntimeError(f"Failed to generate valid MCQ after {max_attempts} attempts: {str(e)}")
+                    # Keep transport failures distinguishable from invalid questions
+                    error = LLMCallError if isinstance(e, LLMCallError) else RuntimeError
+                    raise error(f"Failed to generate valid MCQ after {max_attempts} attempts: {str(e)}")
                 continue
 
-    def generate_fill_blank(self, topic: str, difficulty: str = 'medium') -> FillBlankQuestion:
+    def generate_fill_blank(self, topic: str, difficulty: str = 'medium', deadline=None, cancel_event=None, max_attempts=3,
+                            subtopic: Optional[str] = None) -> FillBlankQuestion:
         """
         Generate Fill in the Blank Question with robust error handling
         Includes:
         - Output parsing using Pydantic
-        - Structured prompt template
+        - Shared, prebuilt prompt template (prompts.py)
         - Multiple retry attempts on failure
         - Validation of blank marker format
+        - Deadline / cancel signal that stops in-flight calls without retrying
+        - Optional subtopic to focus the question on one facet of the topic
         """
-        # Set up Pydantic parser for type checking and validation
-        fill_blank_parser = PydanticOutputParser(pydantic_object=FillBlankQuestion)
-        
-        # Define the prompt template with specific format requirements
-        prompt = PromptTemplate(
-            template=(
-                "Generate a {difficulty} fill-in-the-blank question about {topic}.\n\n"
-                "Return ONLY a JSON object with these exact fields:\n"
-                "- 'question': A sentence with '_____' marking where the blank should be\n"
-                "- 'answer': The correct word or phrase that belongs in the blank\n\n"
-                "Example format:\n"
-                '{{\n'
-                '    "question": "The capital of France is _____.",\n'
-                '    "answer": "Paris"\n'
-                '}}\n\n'
-                "Your response:"
-            ),
-            input_variables=["topic", "difficulty"]
-        )
+        # Template and parser are built once per process (see prompts.py)
+        prompt = get_prompt('fill_blank', self.prompt_variant)
+        focus = f" Focus specifically on: {subtopic}." if subtopic else ""
 
         # Implement retry logic with maximum attempts
-        max_attempts = 3
         for attempt in range(max_attempts):
             try:
                 # Generate response using LLM
-                response = self.llm.invoke(prompt.format(topic=topic, difficulty=difficulty))
-                parsed_response = fill_blank_parser.parse(response.content)
+                response = self._invoke(prompt.format(topic=topic, difficulty=difficulty, focus=focus),
+                                        deadline, cancel_event)
+                parsed_response = prompt.parse(response.content)
                 
                 # Validate the generated question meets requirements
                 if not parsed_response.question or not parsed_response.answer:
@@ -342,9 +652,15 @@ class QuestionGenerator:
                     if "_____" not in parsed_response.question:
                         raise ValueError("Question missing blank marker '_____'")
                 
+                self._count('accepted')
                 return parsed_response
+            except GenerationCancelled:
+                # Deadline or cancel signal - never retry
+                raise
             except Exception as e:
                 # On final attempt, raise error; otherwise continue trying
                 if attempt == max_attempts - 1:
-                    raise RuntimeError(f"Failed to generate valid fill-in-the-blank question after {max_attempts} attempts: {str(e)}")
+                    # Keep transport failures distinguishable from invalid questions
+                    error = LLMCallError if isinstance(e, LLMCallError) else RuntimeError
+                    raise error(f"Failed to generate valid fill-in-the-blank question after {max_attempts} attempts: {str(e)}")
                 continue
\ No newline at end of file
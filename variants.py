@@ -0,0 +1,151 @@
+# Question variants
+# Derives gradable variants of validated questions without another LLM call:
+# per-candidate option and question order, and optional "which is NOT"
+# inversions where the stem can be negated safely. Every variant keeps
+# 'source_index' and an 'option_map' back to the original options, so answers
+# on any variant can be graded and reported against the generated question.
+import re
+import random
+from math import factorial
+
+# Options that refer to the other options stay last and block inversion
+_POSITIONAL = re.compile(r'^(all|none|both|neither) of (the )?(above|these|them)\b|^(both|neither)\b', re.IGNORECASE)
+# Stems that are already negative (or superlative) are never inverted
+_NEGATIVE = re.compile(r"\b(not|except|never|false|incorrect|least|n't)\b", re.IGNORECASE)
+# "Which ... is/are/can ... ?" - NOT goes after a form of "to be" or a modal;
+# "does"/"has" are often the main verb, where that would not read correctly
+_INVERTIBLE = re.compile(r'^(which\b[^?]*?\b)(is|are|was|were|can|will|should|must)\b([^?]*)\?\s*$', re.IGNORECASE)
+
+
+def negate_stem(stem):
+    """'Which X is Y?' -> 'Which X is NOT Y?', or None when that is not safe"""
+    stem = str(stem).strip()
+    if _NEGATIVE.search(stem):
+        return None
+    match = _INVERTIBLE.match(stem)
+    if match is None:
+        return None
+    head, verb, rest = match.groups()
+    return f"{head}{verb} NOT{rest}?"
+
+
+def _pinned(options):
+    return [i for i, option in enumerate(options) if _POSITIONAL.match(str(option).strip())]
+
+
+def option_order(question, rng):
+    """Random order of a question's options; positional options are kept last"""
+    options = question.get('options') or ()
+    pinned = _pinned(options)
+    order = [i for i in range(len(options)) if i not in pinned]
+    rng.shuffle(order)
+    return order + pinned
+
+
+def apply_option_order(question, order):
+    """Copy of question with its options in order, option_map still pointing at the source"""
+    variant = dict(question)
+    option_map = question.get('option_map') or list(range(len(question['options'])))
+    variant['options'] = [question['options'][i] for i in order]
+    variant['option_map'] = [option_map[i] for i in order]
+    return variant
+
+
+def inversions(question):
+    """
+    Two-option "which is NOT" variants, one per distractor
+    With a single correct option only a pair can be inverted safely: the
+    distractor is the one option that is NOT what the stem asks for. These
+    give the original answer away, so never put one in the same quiz as its
+    source question.
+    """
+    options = list(question['options'])
+    if question['correct_answer'] not in options or _pinned(options):
+        return []
+    stem = negate_stem(question['question'])
+    if stem is None:
+        return []
+    correct = options.index(question['correct_answer'])
+    variants = []
+    for i, option in enumerate(options):
+        if i == correct:
+            continue
+        variant = dict(question)
+        variant['question'] = stem
+        variant['options'] = [options[correct], option]
+        variant['correct_answer'] = option
+        variant['option_map'] = [correct, i]
+        variant['variant'] = 'inverted'
+        variants.append(variant)
+    return variants
+
+
+def exam_stems(questions, seed, invert=False):
+    """
+    The stem every candidate sees for each question, with 'source_index'
+    Without invert these are the original questions. With invert, each
+    question that can be inverted safely is asked as the same "which is NOT"
+    pair on every paper, so candidates still sit papers of equal difficulty.
+    """
+    stems = []
+    for index, question in enumerate(questions):
+        candidates = inversions(question) if invert and question['type'] == 'MCQ' else []
+        if candidates:
+            stem = random.Random(f"{seed}:{index}").choice(candidates)
+        else:
+            stem = dict(question)
+            stem['variant'] = 'original'
+        stem['source_index'] = index
+        stems.append(stem)
+    return stems
+
+
+def candidate_quiz(stems, seed):
+    """
+    One candidate's quiz from exam_stems(): question and option order shuffled
+    The same seed always gives the same quiz
+    """
+    rng = random.Random(str(seed))
+    order = list(range(len(stems)))
+    rng.shuffle(order)
+    quiz = []
+    for index in order:
+        stem = stems[index]
+        if stem['type'] == 'MCQ':
+            quiz.append(apply_option_order(stem, option_order(stem, rng)))
+        else:
+            quiz.append(dict(stem))
+    return quiz
+
+
+def map_answer(variant, answer):
+    """Position of a variant's option in the source question's options, or None"""
+    if 'option_map' not in variant or answer not in variant['options']:
+        return None
+    return variant['option_map'][variant['options'].index(answer)]
+
+
+def variant_report(questions, llm_calls):
+    """
+    What a quiz yields per LLM call spent on it
+    - stems: distinct question wordings (original plus a "which is NOT" form
+      where one is safe)
+    - option_orders: distinct option orders, counted separately since they
+      only reshuffle a question
+    """
+    stems = 0
+    option_orders = 0
+    for question in questions:
+        stems += 1
+        if question['type'] == 'MCQ':
+            free = len(question['options']) - len(_pinned(question['options']))
+            option_orders += factorial(free)
+            stems += 1 if inversions(question) else 0
+    return {
+        'questions': len(questions),
+        'stems': stems,
+        'option_orders': option_orders,
+        'llm_calls': llm_calls,
+        'stems_per_call': round(stems / llm_calls, 2) if llm_calls else None,
+        'option_orders_per_call': round(option_orders / llm_calls, 2) if llm_calls else None,
+    }